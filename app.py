@@ -10,6 +10,13 @@ import plotly.express as px
 import plotly.io as pio
 from dash import Dash, html, dcc, Input, Output, State, callback_context
 
+from census_bundle import Bundle
+from census_cube import TimeseriesCube
+from census_frames import read_table
+from census_metrics import PRICE_TO_RENT, add_metrics
+from data_registry import DataRegistry
+from fetch_data import BUNDLE_FILE, USE_BUNDLE, LazyFetcher
+
 pio.templates.default = "plotly_white"
 
 ACS_YEAR = 2024
@@ -21,134 +28,230 @@ FEMALE_COLOR = "Reds"
 MF_COLOR = "RdBu"
 INCOME_COLOR = "Greens"
 
-# Load files ###################################################################################
-state_geom_raw = gpd.read_file("state_geom.shp")
-county_geom_raw = gpd.read_file("county_geom.shp")
-zcta_geom_raw = gpd.read_file("zcta_geom.shp")
-congressional_district_geom_raw = gpd.read_file("congressional_district_geom.shp")
-if DEV_MODE:
-    tract_geom_raw = gpd.read_file("tract_geom.shp")
-    block_group_geom_raw = gpd.read_file("block_group_geom.shp")
+# Data registry ################################################################################
+# Every dataset is fetched (from GCS_BUCKET or DATA_DIR, when set) and built on first use, so
+# the server starts without waiting for the large geometry files. A background prefetch then
+# loads everything, CORE_DATA first, and /ready reports once the core is in. With USE_BUNDLE
+# every file is read from BUNDLE_FILE (build_bundle.py), the only file fetched.
+_REMOTE_DATA = bool(os.environ.get("GCS_BUCKET") or os.environ.get("DATA_DIR"))
+DATA = DataRegistry(fetch=LazyFetcher() if _REMOTE_DATA and not USE_BUNDLE else None)
+
+
+def _load_bundle():
+    if _REMOTE_DATA:
+        LazyFetcher()(BUNDLE_FILE)
+    return Bundle(BUNDLE_FILE)
+
+
+def _source(name):
+    """What a reader opens for the file ``name``: its bundle member if it has one, else its path."""
+    return DATA["bundle"].open(name) if USE_BUNDLE and name in DATA["bundle"] else name
+
+
+def _read_geo(name):
+    return DATA["bundle"].geo(name) if USE_BUNDLE else gpd.read_file(name)
+
+
+if USE_BUNDLE:
+    DATA.register("bundle", _load_bundle)
+
+
+def _shapefile(name):
+    return [f"{name}.{ext}" for ext in ["shp", "shx", "dbf", "prj", "cpg"]]
+
+
+# Pipeline tables are Parquet with an explicit schema, so FIPS/GEOID keys arrive as strings
+def _register_table(name):
+    path = f"{name}_{ACS_YEAR}.parquet"
 
-zcta_to_dma = pd.read_csv("zcta_to_dma.csv", dtype={"zcta": object})
+    def _load():
+        df = read_table(_source(path))
+        add_metrics(df, [PRICE_TO_RENT])
+        return df
 
-dma_polygons_raw = gpd.read_file("dma_polygons.geojson")
-dma_polygons_raw["cartodb_id"] = dma_polygons_raw["cartodb_id"].astype(str)
-dma_polygons_raw["dma_code"] = dma_polygons_raw["dma_code"].astype(str)
+    DATA.register(name, _load, files=[path])
 
-dma_polygon_map = pd.read_csv("dma_polygon_map.csv")
 
-c_state = pd.read_csv(f"c_state_{ACS_YEAR}.csv")
-c_dma = pd.read_csv(f"c_dma_{ACS_YEAR}.csv")
-ts_state = pd.read_csv("c_timeseries_state.csv")
-ts_county = pd.read_csv("c_timeseries_county.csv", dtype={"GEOID": object})
-c_county_state = pd.read_csv(f"c_county_state_{ACS_YEAR}.csv", dtype={"GEOID": object})
-c_zcta_dma = pd.read_csv(f"c_zcta_dma_{ACS_YEAR}.csv", dtype={"zcta": object})
+def _register_metric_cols(name, table, exclude):
+    DATA.register(
+        f"{name}_metric_cols",
+        lambda: sorted(col for col in DATA[table].columns if col not in exclude),
+    )
+
+
+DATA.register(
+    "state_name",
+    lambda: read_table(_source(f"state_name_{ACS_YEAR}.parquet")),
+    files=[f"state_name_{ACS_YEAR}.parquet"],
+)
+DATA.register(
+    "zcta_to_dma",
+    lambda: pd.read_csv(_source("zcta_to_dma.csv"), dtype={"zcta": object}),
+    files=["zcta_to_dma.csv"],
+)
+for _table in ["c_state", "c_dma", "c_county_state", "c_zcta_dma", "c_congressional_district"]:
+    _register_table(_table)
 if DEV_MODE:
-    c_tract = pd.read_csv(f"c_tract_{ACS_YEAR}.csv", dtype={"GEOID": object})
-    c_block_group = pd.read_csv(f"c_block_group_{ACS_YEAR}.csv", dtype={"GEOID": object})
-c_congressional_district = pd.read_csv(
-    f"c_congressional_district_{ACS_YEAR}.csv", dtype={"GEOID": object}
+    _register_table("c_tract")
+    _register_table("c_block_group")
+
+_register_metric_cols("state", "c_state", ["state"])
+_register_metric_cols("dma", "c_dma", ["dma"])
+_register_metric_cols(
+    "county", "c_county_state", ["state", "county", "state_NAME", "GEOID", "NAME"]
+)
+_register_metric_cols("zcta", "c_zcta_dma", ["dma", "zcta"])
+_register_metric_cols(
+    "congressional_district",
+    "c_congressional_district",
+    ["state", "state_NAME", "GEOID", "NAME", "congressional district"],
 )
+if DEV_MODE:
+    _register_metric_cols(
+        "tract", "c_tract", ["state", "county", "state_NAME", "GEOID", "NAME", "tract"]
+    )
+    _register_metric_cols(
+        "block_group",
+        "c_block_group",
+        ["state", "county", "state_NAME", "GEOID", "NAME", "tract", "block group"],
+    )
 
-state_name = pd.read_csv(f"state_name_{ACS_YEAR}.csv", dtype={"state": object})
 
+def _timeseries_cube(table_path, id_col, name_col):
+    """Memory-map the timeseries cube saved beside ``table_path`` (or bundled), or pivot the table.
 
-def _add_price_to_rent(df):
-    if "Median Home Value" in df.columns and "Median Gross Rent" in df.columns:
-        df["price_to_rent_ratio"] = df["Median Home Value"] / (
-            df["Median Gross Rent"] * 12
-        )
+    Without the bundle the deployed app only fetches the Parquet tables, so it builds these
+    cubes in memory.
+    """
+    cube_path = table_path.removesuffix(".parquet") + "_cube"
+    if USE_BUNDLE and cube_path in DATA["bundle"]:
+        return DATA["bundle"].cube(cube_path)
+    if os.path.isdir(cube_path):
+        return TimeseriesCube.load(cube_path)
+    df = read_table(_source(table_path))
+    add_metrics(df, [PRICE_TO_RENT])
+    return TimeseriesCube.from_frame(df, id_col, name_col)
 
 
-_price_to_rent_dfs = [c_state, c_dma, c_county_state, c_zcta_dma, c_congressional_district, ts_state, ts_county]
-if DEV_MODE:
-    _price_to_rent_dfs += [c_tract, c_block_group]
-for _df in _price_to_rent_dfs:
-    _add_price_to_rent(_df)
+def _register_timeseries(label, table_path, id_col, name_col, files=()):
+    name = f"timeseries_{label.lower()}"
+    DATA.register(name, lambda: _timeseries_cube(table_path, id_col, name_col), files=files)
+    TIMESERIES_CUBES[label] = name
 
-# Set up the geographic geometry files #########################################################
-state_geom = state_geom_raw[["NAME", "geometry"]].set_index("NAME")
-state_geom_json = state_geom.to_json()
 
-dma_geom = dma_polygons_raw.merge(
-    dma_polygon_map, left_on="dma_name", right_on="DMA Polygons"
+# Geography level -> registry name of its geography x year x metric cube (Trends, animation)
+TIMESERIES_CUBES = {}
+_register_timeseries(
+    "State", "c_timeseries_state.parquet", "state", "state", ["c_timeseries_state.parquet"]
+)
+_register_timeseries(
+    "County", "c_timeseries_county.parquet", "GEOID", "NAME", ["c_timeseries_county.parquet"]
 )
-dma_geom = dma_geom[["DMA", "geometry"]].set_index("DMA")
-dma_geom_json = dma_geom.to_json()
+# Sub-county timeseries are year-partitioned directories (download_timeseries.py), local only
+if DEV_MODE:
+    for _label, _path, _id_col in [
+        ("ZCTA", "c_timeseries_zcta", "zcta"),
+        ("Tract", "c_timeseries_tract", "GEOID"),
+    ]:
+        if os.path.isdir(_path):
+            _register_timeseries(_label, _path, _id_col, "NAME")
+
+
+# Geometry: GeoJSON is pre-computed per state/city at load to avoid re-serializing per callback
+def _state_geom_json():
+    state_geom = _read_geo("state_geom.shp")[["NAME", "geometry"]].set_index("NAME")
+    return state_geom.to_json()
+
+
+def _dma_geom_json():
+    dma_polygons_raw = _read_geo("dma_polygons.geojson")
+    dma_polygons_raw["cartodb_id"] = dma_polygons_raw["cartodb_id"].astype(str)
+    dma_polygons_raw["dma_code"] = dma_polygons_raw["dma_code"].astype(str)
+    dma_polygon_map = pd.read_csv(_source("dma_polygon_map.csv"))
+    dma_geom = dma_polygons_raw.merge(
+        dma_polygon_map, left_on="dma_name", right_on="DMA Polygons"
+    )
+    return dma_geom[["DMA", "geometry"]].set_index("DMA").to_json()
 
-county_geom = county_geom_raw[["GEOID", "geometry"]].set_index("GEOID")
 
-zcta_geom = zcta_geom_raw.merge(
-    zcta_to_dma[["zcta", "dma"]], how="left", left_on="ZCTA5CE20", right_on="zcta"
-)
+def _county_geom_by_state():
+    county_geom = _read_geo("county_geom.shp")[["GEOID", "geometry"]].set_index("GEOID")
+    return {
+        fips: county_geom[county_geom.index.str[:2] == fips].to_json()
+        for fips in DATA["state_name"]["state"].unique()
+    }
+
+
+def _zcta_geom():
+    return _read_geo("zcta_geom.shp").merge(
+        DATA["zcta_to_dma"][["zcta", "dma"]], how="left", left_on="ZCTA5CE20", right_on="zcta"
+    )
+
+
+def _congressional_district_geom():
+    geom = _read_geo("congressional_district_geom.shp")
+    return geom[["GEOID", "geometry"]].set_index("GEOID")
+
+
+def _tract_geom_by_state():
+    tract_geom = _read_geo("tract_geom.shp")[["GEOID", "geometry"]]
+    return {
+        fips: tract_geom[tract_geom["GEOID"].str[:2] == fips].set_index("GEOID").to_json()
+        for fips in DATA["state_name"]["state"].unique()
+    }
 
-if DEV_MODE:
-    tract_geom = tract_geom_raw[["GEOID", "geometry"]]
-    block_group_geom = block_group_geom_raw[["GEOID", "geometry"]]
-congressional_district_geom = congressional_district_geom_raw[["GEOID", "geometry"]].set_index("GEOID")
-congressional_district_geom_json = congressional_district_geom.to_json()
-
-# Pre-compute GeoJSON per state/city at startup to avoid re-serializing on every callback
-county_geom_by_state = {
-    fips: county_geom[county_geom.index.str[:2] == fips].to_json()
-    for fips in state_name["state"].unique()
-}
 
 _city_fips = {}
 cities = []
-tract_geom_by_state = {}
-block_group_geom_by_city = {}
 if DEV_MODE:
-    tract_geom_by_state = {
-        fips: tract_geom[tract_geom["GEOID"].str[:2] == fips].set_index("GEOID").to_json()
-        for fips in state_name["state"].unique()
-    }
     _city_fips = {
         "New York": ["36005", "36047", "36061", "36081", "36085"],
         "Los Angeles": ["06037"],
         "San Francisco": ["06075"],
     }
-    block_group_geom_by_city = {
+    cities = list(_city_fips.keys())
+
+
+def _block_group_geom_by_city():
+    block_group_geom = _read_geo("block_group_geom.shp")[["GEOID", "geometry"]]
+    return {
         city: block_group_geom[block_group_geom["GEOID"].str[:5].isin(fips)]
         .set_index("GEOID")
         .to_json()
         for city, fips in _city_fips.items()
     }
-    cities = list(_city_fips.keys())
 
-# Metric column lists ##########################################################################
-state_metric_cols = sorted(col for col in c_state.columns if col != "state")
-dma_metric_cols = sorted(col for col in c_dma.columns if col != "dma")
-county_metric_cols = sorted(
-    col
-    for col in c_county_state.columns
-    if col not in ["state", "county", "state_NAME", "GEOID", "NAME"]
+
+DATA.register("state_geom_json", _state_geom_json, files=_shapefile("state_geom"))
+DATA.register("dma_geom_json", _dma_geom_json)  # shipped in the image
+DATA.register("county_geom_by_state", _county_geom_by_state, files=_shapefile("county_geom"))
+DATA.register(
+    "congressional_district_geom",
+    _congressional_district_geom,
+    files=_shapefile("congressional_district_geom"),
 )
-zcta_metric_cols = sorted(
-    col for col in c_zcta_dma.columns if col not in ["dma", "zcta"]
+DATA.register(
+    "congressional_district_geom_json", lambda: DATA["congressional_district_geom"].to_json()
 )
-tract_metric_cols = []
-block_group_metric_cols = []
+DATA.register("zcta_geom", _zcta_geom, files=_shapefile("zcta_geom"))
 if DEV_MODE:
-    tract_metric_cols = sorted(
-        col
-        for col in c_tract.columns
-        if col not in ["state", "county", "state_NAME", "GEOID", "NAME", "tract"]
-    )
-    block_group_metric_cols = sorted(
-        col
-        for col in c_block_group.columns
-        if col not in ["state", "county", "state_NAME", "GEOID", "NAME", "tract", "block group"]
+    DATA.register("tract_geom_by_state", _tract_geom_by_state, files=_shapefile("tract_geom"))
+    DATA.register(
+        "block_group_geom_by_city", _block_group_geom_by_city, files=_shapefile("block_group_geom")
     )
-congressional_district_metric_cols = sorted(
-    col
-    for col in c_congressional_district.columns
-    if col not in ["state", "state_NAME", "GEOID", "NAME", "congressional district"]
-)
 
-dmas = c_dma["dma"].unique()
-states = state_name["state_NAME"].unique()
+# The State map and the tables every page's dropdowns read; the rest loads behind them
+CORE_DATA = [
+    "state_name",
+    "c_state",
+    "state_geom_json",
+    "timeseries_state",
+    "c_dma",
+    "c_county_state",
+    "c_zcta_dma",
+    "c_congressional_district",
+]
+DATA.prefetch(CORE_DATA + [name for name in DATA.names if name not in CORE_DATA])
 
 TIMESERIES_METRICS = [
     "Pop",
@@ -168,12 +271,12 @@ TIMESERIES_METRICS = [
     "price_to_rent_ratio",
 ]
 
-TIMESERIES_GEOS = {
-    "State": (ts_state, "state"),
-    "County": (ts_county, "NAME"),
-}
 
-_ts_state_defaults = ts_state.groupby("state")["Pop"].mean().nlargest(4).index.tolist()
+def _ts_defaults(cube):
+    """The four most populous geographies of a timeseries cube, the Trends tab's default."""
+    pop = np.nanmean(cube.block(["Pop"])[:, :, 0], axis=1)
+    return pd.Series(pop, index=cube.names).nlargest(4).index.tolist()
+
 
 SUGGESTED_TRENDS = [
     {
@@ -311,25 +414,25 @@ SUGGESTED_ANIM_SCATTERS = [
     },
 ]
 
-# Scatter geography config: name → (dataframe, label_col, metric_cols)
+# Scatter geography config: name → (table, label_col, metric_cols), tables by registry name
 SCATTER_GEOS = {
-    "State": (c_state, "state", state_metric_cols),
-    "DMA": (c_dma, "dma", dma_metric_cols),
-    "County": (c_county_state, "NAME", county_metric_cols),
-    "ZCTA": (c_zcta_dma, "zcta", zcta_metric_cols),
+    "State": ("c_state", "state", "state_metric_cols"),
+    "DMA": ("c_dma", "dma", "dma_metric_cols"),
+    "County": ("c_county_state", "NAME", "county_metric_cols"),
+    "ZCTA": ("c_zcta_dma", "zcta", "zcta_metric_cols"),
     "Congressional District": (
-        c_congressional_district,
+        "c_congressional_district",
         "NAME",
-        congressional_district_metric_cols,
+        "congressional_district_metric_cols",
     ),
 }
 
 CORR_GEOS = {
-    "State": (c_state, state_metric_cols),
-    "DMA": (c_dma, dma_metric_cols),
-    "County": (c_county_state, county_metric_cols),
-    "ZCTA": (c_zcta_dma, zcta_metric_cols),
-    "Congressional District": (c_congressional_district, congressional_district_metric_cols),
+    "State": ("c_state", "state_metric_cols"),
+    "DMA": ("c_dma", "dma_metric_cols"),
+    "County": ("c_county_state", "county_metric_cols"),
+    "ZCTA": ("c_zcta_dma", "zcta_metric_cols"),
+    "Congressional District": ("c_congressional_district", "congressional_district_metric_cols"),
 }
 
 CORR_METRIC_GROUPS = {
@@ -475,14 +578,13 @@ CPI = {
 CPI_COLS = ["Median Household Income", "Median Home Value", "Median Gross Rent"]
 
 
-def _apply_cpi(df, year_col="year"):
-    df = df.copy()
-    for col in CPI_COLS:
-        if col in df.columns:
-            df[col] = df[col] * df[year_col].map(
-                lambda y: CPI[2024] / CPI.get(y, CPI[2024])
-            )
-    return df
+def _apply_cpi(block, years, metrics):
+    """Scale the dollar metrics of a cube block (geography x year x metric) in place."""
+    factors = np.array([CPI[2024] / CPI.get(y, CPI[2024]) for y in years])
+    for j, metric in enumerate(metrics):
+        if metric in CPI_COLS:
+            block[:, :, j] *= factors
+    return block
 
 
 def _inflate_checkbox(component_id):
@@ -645,6 +747,13 @@ def _normalize_checkbox(component_id):
 app = Dash(__name__)
 server = app.server  # for gunicorn
 
+
+@server.route("/ready")
+def ready():
+    """200 once the first tab's datasets are loaded (a readiness probe), 503 until then."""
+    return ("ok", 200) if DATA.loaded(CORE_DATA) else ("loading", 503)
+
+
 _tab_style = {"fontFamily": "Arial"}
 _sidebar_style = {"fontFamily": "Arial", "width": "300px", "padding": "20px", "flexShrink": 0}
 _chart_style = {"flexGrow": 1, "padding": "20px"}
@@ -652,737 +761,743 @@ _flex_row = {"display": "flex", "alignItems": "flex-start"}
 _bold = {"fontWeight": "bold"}
 _bold_mt = {"fontWeight": "bold", "marginTop": "12px"}
 
-app.layout = html.Div(
-    [
-        html.H1("Census Data Explorer", style={"fontFamily": "Arial"}),
-        dcc.Store(id="trends-active-preset", data=None),
-        dcc.Store(id="scatter-active-preset", data=None),
-        dcc.Store(id="anim-active-preset", data=None),
-        dcc.Store(id="corr-active-group", data=None),
-        dcc.Tabs(
-            [
-                dcc.Tab(
-                    label="US Map",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="us-map-geo-selector",
-                                            options=[
-                                                {"label": "State", "value": "State"},
-                                                {"label": "DMA", "value": "DMA"},
-                                                {"label": "Congressional District", "value": "Congressional District"},
-                                            ],
-                                            value="State",
-                                            multi=False,
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Select Metrics",
-                                            style=_bold_mt,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="us-map-metric-selector",
-                                            options=_make_options(state_metric_cols),
-                                            value=[DEFAULT_VAR],
-                                            multi=True,
-                                            placeholder="Select metrics...",
-                                        ),
-                                        _normalize_checkbox("us-map-normalize"),
-                                        dcc.Checklist(
-                                            id="us-map-exclude-pr",
-                                            options=[{"label": "  Exclude Puerto Rico", "value": "exclude"}],
-                                            value=[],
-                                            inline=True,
-                                            style={"fontFamily": "Arial", "marginTop": "8px"},
-                                        ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        html.Iframe(
-                                            id="us_map", width="100%", height="700"
-                                        )
-                                    ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style=_flex_row,
-                        )
-                    ],
-                ),
-                dcc.Tab(
-                    label="State Map",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
+def serve_layout():
+    """Page layout, built per page load from the registry (waits only for the tables it reads)."""
+    ts_state = DATA["timeseries_state"]
+    return html.Div(
+        [
+            html.H1("Census Data Explorer", style={"fontFamily": "Arial"}),
+            dcc.Store(id="trends-active-preset", data=None),
+            dcc.Store(id="scatter-active-preset", data=None),
+            dcc.Store(id="anim-active-preset", data=None),
+            dcc.Store(id="corr-active-group", data=None),
+            dcc.Tabs(
+                [
+                    dcc.Tab(
+                        label="US Map",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="us-map-geo-selector",
+                                                options=[
+                                                    {"label": "State", "value": "State"},
+                                                    {"label": "DMA", "value": "DMA"},
+                                                    {"label": "Congressional District", "value": "Congressional District"},
+                                                ],
+                                                value="State",
+                                                multi=False,
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Select Metrics",
+                                                style=_bold_mt,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="us-map-metric-selector",
+                                                options=_make_options(DATA["state_metric_cols"]),
+                                                value=[DEFAULT_VAR],
+                                                multi=True,
+                                                placeholder="Select metrics...",
+                                            ),
+                                            _normalize_checkbox("us-map-normalize"),
+                                            dcc.Checklist(
+                                                id="us-map-exclude-pr",
+                                                options=[{"label": "  Exclude Puerto Rico", "value": "exclude"}],
+                                                value=[],
+                                                inline=True,
+                                                style={"fontFamily": "Arial", "marginTop": "8px"},
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Iframe(
+                                                id="us_map", width="100%", height="700"
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
+                                ],
+                                style=_flex_row,
+                            )
+                        ],
+                    ),
+                    dcc.Tab(
+                        label="State Map",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="state-map-geo",
+                                                options=[
+                                                    {"label": "County", "value": "County"},
+                                                    {"label": "Congressional District", "value": "Congressional District"},
+                                                    *([{"label": "Tract", "value": "Tract"}] if DEV_MODE else []),
+                                                ],
+                                                value="County",
+                                                multi=False,
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Select Metrics",
+                                                style=_bold_mt,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="state-map-metric",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value=[DEFAULT_VAR],
+                                                multi=True,
+                                                placeholder="Select metrics...",
+                                            ),
+                                            _normalize_checkbox("state-map-normalize"),
+                                            html.Label(
+                                                "Select State", style={"fontWeight": "bold"}
+                                            ),
+                                            dcc.Dropdown(
+                                                id="state-map-state",
+                                                options=DATA["state_name"]["state_NAME"].unique(),
+                                                value="New York",
+                                                multi=False,
+                                                placeholder="Select State...",
+                                            ),
+                                            html.Div(
+                                                id="state-map-tract-filters",
+                                                children=[
+                                                    html.Label(
+                                                        "Exclude GEOIDs",
+                                                        style=_bold,
+                                                    ),
+                                                    dcc.Dropdown(
+                                                        id="state-map-exclude",
+                                                        options=[],
+                                                        multi=True,
+                                                        placeholder="Select GEOIDs to exclude...",
+                                                    ),
+                                                    html.Label(
+                                                        "Minimum Population",
+                                                        style=_bold,
+                                                    ),
+                                                    dcc.Input(
+                                                        id="state-map-pop-min",
+                                                        type="number",
+                                                        value=0,
+                                                        min=0,
+                                                        step=1,
+                                                    ),
+                                                ],
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Iframe(
+                                                id="state_map", width="100%", height="700"
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
+                                ],
+                                style=_flex_row,
+                            )
+                        ],
+                    ),
+                    dcc.Tab(
+                        label="ZCTAs",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Select Metrics",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="zcta-metric-selector",
+                                                options=_make_options(DATA["zcta_metric_cols"]),
+                                                value=[DEFAULT_VAR],
+                                                multi=True,
+                                                placeholder="Select metrics...",
+                                            ),
+                                            _normalize_checkbox("zcta-normalize"),
+                                            html.Label(
+                                                "Select DMA", style={"fontWeight": "bold"}
+                                            ),
+                                            dcc.Dropdown(
+                                                id="dma-selector",
+                                                options=DATA["c_dma"]["dma"].unique(),
+                                                value="New York",
+                                                multi=False,
+                                                placeholder="Select DMA...",
+                                            ),
+                                            html.Label(
+                                                "Minimum Population",
+                                                style=_bold,
+                                            ),
+                                            dcc.Input(
+                                                id="zcta-pop-min",
+                                                type="number",
+                                                value=0,
+                                                min=0,
+                                                step=1,
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            html.Iframe(
+                                                id="zcta_map", width="100%", height="700"
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
+                                ],
+                                style=_flex_row,
+                            )
+                        ],
+                    ),
+                    *(
+                        [dcc.Tab(
+                            label="Block Groups",
+                            style=_tab_style,
+                            selected_style=_tab_style,
+                            children=[
                                 html.Div(
                                     [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="state-map-geo",
-                                            options=[
-                                                {"label": "County", "value": "County"},
-                                                {"label": "Congressional District", "value": "Congressional District"},
-                                                *([{"label": "Tract", "value": "Tract"}] if DEV_MODE else []),
-                                            ],
-                                            value="County",
-                                            multi=False,
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Select Metrics",
-                                            style=_bold_mt,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="state-map-metric",
-                                            options=_make_options(county_metric_cols),
-                                            value=[DEFAULT_VAR],
-                                            multi=True,
-                                            placeholder="Select metrics...",
-                                        ),
-                                        _normalize_checkbox("state-map-normalize"),
-                                        html.Label(
-                                            "Select State", style={"fontWeight": "bold"}
-                                        ),
-                                        dcc.Dropdown(
-                                            id="state-map-state",
-                                            options=states,
-                                            value="New York",
-                                            multi=False,
-                                            placeholder="Select State...",
-                                        ),
                                         html.Div(
-                                            id="state-map-tract-filters",
-                                            children=[
-                                                html.Label(
-                                                    "Exclude GEOIDs",
-                                                    style=_bold,
+                                            [
+                                                html.Label("Select Metrics", style=_bold),
+                                                dcc.Dropdown(
+                                                    id="block-group-metric-selector",
+                                                    options=_make_options(DATA["block_group_metric_cols"]),
+                                                    value=[DEFAULT_VAR],
+                                                    multi=True,
+                                                    placeholder="Select metrics...",
                                                 ),
+                                                _normalize_checkbox("block-group-normalize"),
+                                                html.Label("Select City", style={"fontWeight": "bold"}),
                                                 dcc.Dropdown(
-                                                    id="state-map-exclude",
+                                                    id="city-selector",
+                                                    options=cities,
+                                                    value="New York",
+                                                    multi=False,
+                                                    placeholder="Select City...",
+                                                ),
+                                                html.Label("Exclude GEOIDs", style=_bold),
+                                                dcc.Dropdown(
+                                                    id="block-group-exclude",
                                                     options=[],
                                                     multi=True,
                                                     placeholder="Select GEOIDs to exclude...",
                                                 ),
-                                                html.Label(
-                                                    "Minimum Population",
-                                                    style=_bold,
-                                                ),
+                                                html.Label("Minimum Population", style=_bold),
                                                 dcc.Input(
-                                                    id="state-map-pop-min",
+                                                    id="block-group-pop-min",
                                                     type="number",
                                                     value=0,
                                                     min=0,
                                                     step=1,
                                                 ),
                                             ],
+                                            style=_sidebar_style,
                                         ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        html.Iframe(
-                                            id="state_map", width="100%", height="700"
-                                        )
-                                    ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style=_flex_row,
-                        )
-                    ],
-                ),
-                dcc.Tab(
-                    label="ZCTAs",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Select Metrics",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="zcta-metric-selector",
-                                            options=_make_options(zcta_metric_cols),
-                                            value=[DEFAULT_VAR],
-                                            multi=True,
-                                            placeholder="Select metrics...",
-                                        ),
-                                        _normalize_checkbox("zcta-normalize"),
-                                        html.Label(
-                                            "Select DMA", style={"fontWeight": "bold"}
-                                        ),
-                                        dcc.Dropdown(
-                                            id="dma-selector",
-                                            options=dmas,
-                                            value="New York",
-                                            multi=False,
-                                            placeholder="Select DMA...",
-                                        ),
-                                        html.Label(
-                                            "Minimum Population",
-                                            style=_bold,
-                                        ),
-                                        dcc.Input(
-                                            id="zcta-pop-min",
-                                            type="number",
-                                            value=0,
-                                            min=0,
-                                            step=1,
+                                        html.Div(
+                                            [html.Iframe(id="block_group_map", width="100%", height="700")],
+                                            style=_chart_style,
                                         ),
                                     ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        html.Iframe(
-                                            id="zcta_map", width="100%", height="700"
-                                        )
-                                    ],
-                                    style=_chart_style,
-                                ),
+                                    style=_flex_row,
+                                )
                             ],
-                            style=_flex_row,
-                        )
-                    ],
-                ),
-                *(
-                    [dcc.Tab(
-                        label="Block Groups",
+                        )]
+                        if DEV_MODE else []
+                    ),
+                    dcc.Tab(
+                        label="Trends",
                         style=_tab_style,
                         selected_style=_tab_style,
                         children=[
+                            html.Div(
+                                [
+                                    html.Span(
+                                        "Suggested: ",
+                                        style={
+                                            "fontFamily": "Arial",
+                                            "fontWeight": "bold",
+                                            "marginRight": "8px",
+                                            "whiteSpace": "nowrap",
+                                        },
+                                    ),
+                                    *[
+                                        html.Button(
+                                            s["label"],
+                                            id=f"trends-preset-{i}",
+                                            n_clicks=0,
+                                            style=_btn_style,
+                                        )
+                                        for i, s in enumerate(SUGGESTED_TRENDS)
+                                    ],
+                                ],
+                                style={
+                                    "padding": "8px 20px",
+                                    "borderBottom": "1px solid #eee",
+                                    "display": "flex",
+                                    "flexWrap": "wrap",
+                                    "alignItems": "center",
+                                    "gap": "4px",
+                                },
+                            ),
                             html.Div(
                                 [
                                     html.Div(
                                         [
-                                            html.Label("Select Metrics", style=_bold),
-                                            dcc.Dropdown(
-                                                id="block-group-metric-selector",
-                                                options=_make_options(block_group_metric_cols),
-                                                value=[DEFAULT_VAR],
-                                                multi=True,
-                                                placeholder="Select metrics...",
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
                                             ),
-                                            _normalize_checkbox("block-group-normalize"),
-                                            html.Label("Select City", style={"fontWeight": "bold"}),
                                             dcc.Dropdown(
-                                                id="city-selector",
-                                                options=cities,
-                                                value="New York",
-                                                multi=False,
-                                                placeholder="Select City...",
+                                                id="trends-geo-level",
+                                                options=list(TIMESERIES_CUBES.keys()),
+                                                value="State",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Select Geography",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
                                             ),
-                                            html.Label("Exclude GEOIDs", style=_bold),
                                             dcc.Dropdown(
-                                                id="block-group-exclude",
-                                                options=[],
+                                                id="trends-geo",
+                                                options=sorted(ts_state.names),
+                                                value=_ts_defaults(ts_state),
                                                 multi=True,
-                                                placeholder="Select GEOIDs to exclude...",
+                                                placeholder="Select geographies to compare...",
                                             ),
-                                            html.Label("Minimum Population", style=_bold),
-                                            dcc.Input(
-                                                id="block-group-pop-min",
-                                                type="number",
-                                                value=0,
-                                                min=0,
-                                                step=1,
+                                            html.Label(
+                                                "Metric",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="trends-metric",
+                                                options=_make_options(TIMESERIES_METRICS),
+                                                value="Median Household Income",
+                                                clearable=False,
+                                            ),
+                                            _inflate_checkbox("trends-inflate"),
+                                            html.P(
+                                                "ACS 5-Year Estimates (rolling average). "
+                                                "Each point represents a 5-year window.",
+                                                style={
+                                                    "fontSize": "11px",
+                                                    "color": "#888",
+                                                    "marginTop": "16px",
+                                                },
                                             ),
                                         ],
                                         style=_sidebar_style,
                                     ),
                                     html.Div(
-                                        [html.Iframe(id="block_group_map", width="100%", height="700")],
+                                        [
+                                            dcc.Graph(
+                                                id="trends-chart", style={"height": "700px"}
+                                            )
+                                        ],
                                         style=_chart_style,
                                     ),
                                 ],
                                 style=_flex_row,
-                            )
+                            ),
                         ],
-                    )]
-                    if DEV_MODE else []
-                ),
-                dcc.Tab(
-                    label="Trends",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Span(
-                                    "Suggested: ",
-                                    style={
-                                        "fontFamily": "Arial",
-                                        "fontWeight": "bold",
-                                        "marginRight": "8px",
-                                        "whiteSpace": "nowrap",
-                                    },
-                                ),
-                                *[
-                                    html.Button(
-                                        s["label"],
-                                        id=f"trends-preset-{i}",
-                                        n_clicks=0,
-                                        style=_btn_style,
-                                    )
-                                    for i, s in enumerate(SUGGESTED_TRENDS)
-                                ],
-                            ],
-                            style={
-                                "padding": "8px 20px",
-                                "borderBottom": "1px solid #eee",
-                                "display": "flex",
-                                "flexWrap": "wrap",
-                                "alignItems": "center",
-                                "gap": "4px",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="trends-geo-level",
-                                            options=list(TIMESERIES_GEOS.keys()),
-                                            value="State",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Select Geography",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="trends-geo",
-                                            options=sorted(ts_state["state"].unique()),
-                                            value=_ts_state_defaults,
-                                            multi=True,
-                                            placeholder="Select geographies to compare...",
-                                        ),
-                                        html.Label(
-                                            "Metric",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="trends-metric",
-                                            options=_make_options(TIMESERIES_METRICS),
-                                            value="Median Household Income",
-                                            clearable=False,
-                                        ),
-                                        _inflate_checkbox("trends-inflate"),
-                                        html.P(
-                                            "ACS 5-Year Estimates (rolling average). "
-                                            "Each point represents a 5-year window.",
-                                            style={
-                                                "fontSize": "11px",
-                                                "color": "#888",
-                                                "marginTop": "16px",
-                                            },
-                                        ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        dcc.Graph(
-                                            id="trends-chart", style={"height": "700px"}
+                    ),
+                    dcc.Tab(
+                        label="Animated Scatter",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Span(
+                                        "Suggested: ",
+                                        style={
+                                            "fontFamily": "Arial",
+                                            "fontWeight": "bold",
+                                            "marginRight": "8px",
+                                        },
+                                    ),
+                                    *[
+                                        html.Button(
+                                            s["label"],
+                                            id=f"anim-preset-{i}",
+                                            n_clicks=0,
+                                            style=_btn_style,
                                         )
+                                        for i, s in enumerate(SUGGESTED_ANIM_SCATTERS)
                                     ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style=_flex_row,
-                        ),
-                    ],
-                ),
-                dcc.Tab(
-                    label="Animated Scatter",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Span(
-                                    "Suggested: ",
-                                    style={
-                                        "fontFamily": "Arial",
-                                        "fontWeight": "bold",
-                                        "marginRight": "8px",
-                                    },
-                                ),
-                                *[
-                                    html.Button(
-                                        s["label"],
-                                        id=f"anim-preset-{i}",
-                                        n_clicks=0,
-                                        style=_btn_style,
-                                    )
-                                    for i, s in enumerate(SUGGESTED_ANIM_SCATTERS)
                                 ],
-                            ],
-                            style={
-                                "padding": "12px 20px",
-                                "borderBottom": "1px solid #eee",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="anim-geo-level",
-                                            options=list(TIMESERIES_GEOS.keys()),
-                                            value="State",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "X Axis",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="anim-x",
-                                            options=_make_options(TIMESERIES_METRICS),
-                                            value="pct_poverty",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Y Axis",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="anim-y",
-                                            options=_make_options(TIMESERIES_METRICS),
-                                            value="Median Household Income",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Color by (optional)",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="anim-color",
-                                            options=_make_options(TIMESERIES_METRICS),
-                                            value="pct_black",
-                                            clearable=True,
-                                            placeholder="None",
-                                        ),
-                                        html.Label(
-                                            "Size by (optional)",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="anim-size",
-                                            options=_make_options(TIMESERIES_METRICS),
-                                            value="Pop",
-                                            clearable=True,
-                                            placeholder="None",
-                                        ),
-                                        _inflate_checkbox("anim-inflate"),
-                                        html.P(
-                                            "ACS 5-Year Estimates (rolling average). "
-                                            "Each point represents a 5-year window.",
-                                            style={
-                                                "fontSize": "11px",
-                                                "color": "#888",
-                                                "marginTop": "16px",
-                                            },
-                                        ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        dcc.Graph(
-                                            id="anim-scatter-plot",
-                                            style={"height": "700px"},
-                                        )
-                                    ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style=_flex_row,
-                        ),
-                    ],
-                ),
-                dcc.Tab(
-                    label="Scatter",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Span(
-                                    "Suggested: ",
-                                    style={
-                                        "fontFamily": "Arial",
-                                        "fontWeight": "bold",
-                                        "marginRight": "8px",
-                                        "whiteSpace": "nowrap",
-                                    },
-                                ),
-                                *[
-                                    html.Button(
-                                        s["label"],
-                                        id=f"scatter-preset-{i}",
-                                        n_clicks=0,
-                                        style=_btn_style,
-                                    )
-                                    for i, s in enumerate(SUGGESTED_SCATTERS)
+                                style={
+                                    "padding": "12px 20px",
+                                    "borderBottom": "1px solid #eee",
+                                },
+                            ),
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="anim-geo-level",
+                                                options=list(TIMESERIES_CUBES.keys()),
+                                                value="State",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "X Axis",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="anim-x",
+                                                options=_make_options(TIMESERIES_METRICS),
+                                                value="pct_poverty",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Y Axis",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="anim-y",
+                                                options=_make_options(TIMESERIES_METRICS),
+                                                value="Median Household Income",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Color by (optional)",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="anim-color",
+                                                options=_make_options(TIMESERIES_METRICS),
+                                                value="pct_black",
+                                                clearable=True,
+                                                placeholder="None",
+                                            ),
+                                            html.Label(
+                                                "Size by (optional)",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="anim-size",
+                                                options=_make_options(TIMESERIES_METRICS),
+                                                value="Pop",
+                                                clearable=True,
+                                                placeholder="None",
+                                            ),
+                                            _inflate_checkbox("anim-inflate"),
+                                            html.P(
+                                                "ACS 5-Year Estimates (rolling average). "
+                                                "Each point represents a 5-year window.",
+                                                style={
+                                                    "fontSize": "11px",
+                                                    "color": "#888",
+                                                    "marginTop": "16px",
+                                                },
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            dcc.Graph(
+                                                id="anim-scatter-plot",
+                                                style={"height": "700px"},
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
                                 ],
-                            ],
-                            style={
-                                "padding": "8px 20px",
-                                "borderBottom": "1px solid #eee",
-                                "display": "flex",
-                                "flexWrap": "wrap",
-                                "alignItems": "center",
-                                "gap": "4px",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-geo",
-                                            options=list(SCATTER_GEOS.keys()),
-                                            value="County",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "X Axis",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-x",
-                                            options=_make_options(county_metric_cols),
-                                            value="Pop",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Y Axis",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-y",
-                                            options=_make_options(county_metric_cols),
-                                            value="pct_male",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Color by (optional)",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-color",
-                                            options=_make_options(county_metric_cols),
-                                            value=None,
-                                            clearable=True,
-                                            placeholder="None",
-                                        ),
-                                        html.Label(
-                                            "Size by (optional)",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-size",
-                                            options=_make_options(county_metric_cols),
-                                            value=None,
-                                            clearable=True,
-                                            placeholder="None",
-                                        ),
-                                        dcc.Checklist(
-                                            id="scatter-trendline",
-                                            options=[
-                                                {
-                                                    "label": "  Show trend line",
-                                                    "value": "show",
-                                                }
-                                            ],
-                                            value=[],
-                                            inline=True,
-                                            style={
-                                                "fontFamily": "Arial",
-                                                "marginTop": "14px",
-                                                "fontSize": "13px",
-                                            },
-                                        ),
-                                        html.Label(
-                                            id="scatter-filter-label",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "16px",
-                                                "display": "block",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="scatter-filter",
-                                            options=[],
-                                            value=[],
-                                            multi=True,
-                                            placeholder="All",
-                                            disabled=True,
-                                            style={"marginTop": "4px"},
-                                        ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        dcc.Graph(
-                                            id="scatter-plot",
-                                            style={"height": "700px"},
+                                style=_flex_row,
+                            ),
+                        ],
+                    ),
+                    dcc.Tab(
+                        label="Scatter",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Span(
+                                        "Suggested: ",
+                                        style={
+                                            "fontFamily": "Arial",
+                                            "fontWeight": "bold",
+                                            "marginRight": "8px",
+                                            "whiteSpace": "nowrap",
+                                        },
+                                    ),
+                                    *[
+                                        html.Button(
+                                            s["label"],
+                                            id=f"scatter-preset-{i}",
+                                            n_clicks=0,
+                                            style=_btn_style,
                                         )
+                                        for i, s in enumerate(SUGGESTED_SCATTERS)
                                     ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style={
-                                "display": "flex",
-                                "alignItems": "flex-start",
-                            },
-                        ),
-                    ],
-                ),
-                dcc.Tab(
-                    label="Correlation",
-                    style=_tab_style,
-                    selected_style=_tab_style,
-                    children=[
-                        html.Div(
-                            [
-                                html.Span(
-                                    "Suggested: ",
-                                    style={
-                                        "fontFamily": "Arial",
-                                        "fontWeight": "bold",
-                                        "marginRight": "8px",
-                                    },
-                                ),
-                                *[
-                                    html.Button(
-                                        label,
-                                        id=f"corr-group-{i}",
-                                        n_clicks=0,
-                                        style=_btn_style,
-                                    )
-                                    for i, label in enumerate(CORR_METRIC_GROUPS.keys())
                                 ],
-                            ],
-                            style={
-                                "padding": "12px 20px",
-                                "borderBottom": "1px solid #eee",
-                            },
-                        ),
-                        html.Div(
-                            [
-                                html.Div(
-                                    [
-                                        html.Label(
-                                            "Geography Level",
-                                            style=_bold,
-                                        ),
-                                        dcc.Dropdown(
-                                            id="corr-geo-level",
-                                            options=list(CORR_GEOS.keys()),
-                                            value="County",
-                                            clearable=False,
-                                        ),
-                                        html.Label(
-                                            "Metrics",
-                                            style={
-                                                "fontWeight": "bold",
-                                                "marginTop": "12px",
-                                            },
-                                        ),
-                                        dcc.Dropdown(
-                                            id="corr-metrics",
-                                            options=_make_options(county_metric_cols),
-                                            value=CORR_METRIC_GROUPS[next(iter(CORR_METRIC_GROUPS))],
-                                            multi=True,
-                                            placeholder="Select metrics...",
-                                        ),
-                                    ],
-                                    style=_sidebar_style,
-                                ),
-                                html.Div(
-                                    [
-                                        dcc.Graph(
-                                            id="corr-matrix", style={"height": "700px"}
+                                style={
+                                    "padding": "8px 20px",
+                                    "borderBottom": "1px solid #eee",
+                                    "display": "flex",
+                                    "flexWrap": "wrap",
+                                    "alignItems": "center",
+                                    "gap": "4px",
+                                },
+                            ),
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-geo",
+                                                options=list(SCATTER_GEOS.keys()),
+                                                value="County",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "X Axis",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-x",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value="Pop",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Y Axis",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-y",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value="pct_male",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Color by (optional)",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-color",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value=None,
+                                                clearable=True,
+                                                placeholder="None",
+                                            ),
+                                            html.Label(
+                                                "Size by (optional)",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-size",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value=None,
+                                                clearable=True,
+                                                placeholder="None",
+                                            ),
+                                            dcc.Checklist(
+                                                id="scatter-trendline",
+                                                options=[
+                                                    {
+                                                        "label": "  Show trend line",
+                                                        "value": "show",
+                                                    }
+                                                ],
+                                                value=[],
+                                                inline=True,
+                                                style={
+                                                    "fontFamily": "Arial",
+                                                    "marginTop": "14px",
+                                                    "fontSize": "13px",
+                                                },
+                                            ),
+                                            html.Label(
+                                                id="scatter-filter-label",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "16px",
+                                                    "display": "block",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="scatter-filter",
+                                                options=[],
+                                                value=[],
+                                                multi=True,
+                                                placeholder="All",
+                                                disabled=True,
+                                                style={"marginTop": "4px"},
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            dcc.Graph(
+                                                id="scatter-plot",
+                                                style={"height": "700px"},
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
+                                ],
+                                style={
+                                    "display": "flex",
+                                    "alignItems": "flex-start",
+                                },
+                            ),
+                        ],
+                    ),
+                    dcc.Tab(
+                        label="Correlation",
+                        style=_tab_style,
+                        selected_style=_tab_style,
+                        children=[
+                            html.Div(
+                                [
+                                    html.Span(
+                                        "Suggested: ",
+                                        style={
+                                            "fontFamily": "Arial",
+                                            "fontWeight": "bold",
+                                            "marginRight": "8px",
+                                        },
+                                    ),
+                                    *[
+                                        html.Button(
+                                            label,
+                                            id=f"corr-group-{i}",
+                                            n_clicks=0,
+                                            style=_btn_style,
                                         )
+                                        for i, label in enumerate(CORR_METRIC_GROUPS.keys())
                                     ],
-                                    style=_chart_style,
-                                ),
-                            ],
-                            style=_flex_row,
-                        ),
-                    ],
-                ),
-            ],
-        ),
-    ]
-)
+                                ],
+                                style={
+                                    "padding": "12px 20px",
+                                    "borderBottom": "1px solid #eee",
+                                },
+                            ),
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            html.Label(
+                                                "Geography Level",
+                                                style=_bold,
+                                            ),
+                                            dcc.Dropdown(
+                                                id="corr-geo-level",
+                                                options=list(CORR_GEOS.keys()),
+                                                value="County",
+                                                clearable=False,
+                                            ),
+                                            html.Label(
+                                                "Metrics",
+                                                style={
+                                                    "fontWeight": "bold",
+                                                    "marginTop": "12px",
+                                                },
+                                            ),
+                                            dcc.Dropdown(
+                                                id="corr-metrics",
+                                                options=_make_options(DATA["county_metric_cols"]),
+                                                value=CORR_METRIC_GROUPS[next(iter(CORR_METRIC_GROUPS))],
+                                                multi=True,
+                                                placeholder="Select metrics...",
+                                            ),
+                                        ],
+                                        style=_sidebar_style,
+                                    ),
+                                    html.Div(
+                                        [
+                                            dcc.Graph(
+                                                id="corr-matrix", style={"height": "700px"}
+                                            )
+                                        ],
+                                        style=_chart_style,
+                                    ),
+                                ],
+                                style=_flex_row,
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+        ]
+    )
+
+
+app.layout = serve_layout
 
 
 # Map generation ###############################################################################
@@ -1420,7 +1535,7 @@ def _build_choropleth_map(
                 label = (
                     str(data_df_indexed.loc[s["id"], name_col]) if name_col else s["id"]
                 )
-                val = data_df_indexed.loc[s["id"], i]
+                val = float(data_df_indexed.loc[s["id"], i])
             else:
                 label = s["id"]
                 val = 0
@@ -1436,42 +1551,42 @@ def _build_choropleth_map(
 
 def generate_state_map(selected_metrics, normalize=False, exclude_pr=False):
     """Render state choropleth map."""
-    df = _normalize_df(c_state, selected_metrics) if normalize else c_state
+    df = _normalize_df(DATA["c_state"], selected_metrics) if normalize else DATA["c_state"]
     if exclude_pr:
         df = df[df["state"] != "Puerto Rico"]
     return _build_choropleth_map(
-        state_geom_json, df, "state", "State", selected_metrics
+        DATA["state_geom_json"], df, "state", "State", selected_metrics
     )
 
 
 def generate_dma_map(selected_metrics, normalize=False, exclude_pr=False):
     _ = exclude_pr  # DMAs never include PR; parameter exists for dispatch compatibility
-    df = _normalize_df(c_dma, selected_metrics) if normalize else c_dma
-    return _build_choropleth_map(dma_geom_json, df, "dma", "DMA", selected_metrics)
+    df = _normalize_df(DATA["c_dma"], selected_metrics) if normalize else DATA["c_dma"]
+    return _build_choropleth_map(DATA["dma_geom_json"], df, "dma", "DMA", selected_metrics)
 
 
 def generate_county_map(selected_metrics, selected_state, normalize=False):
     """Render county choropleth map for a single state."""
-    state_fips = state_name.loc[
-        state_name["state_NAME"] == selected_state, "state"
+    state_fips = DATA["state_name"].loc[
+        DATA["state_name"]["state_NAME"] == selected_state, "state"
     ].values[0]
-    df = c_county_state.loc[c_county_state["GEOID"].str[:2] == state_fips].reset_index(drop=True)
+    counties = DATA["c_county_state"]
+    df = counties.loc[counties["GEOID"].str[:2] == state_fips].reset_index(drop=True)
     if normalize:
         df = _normalize_df(df, selected_metrics)
-    return _build_choropleth_map(
-        county_geom_by_state[state_fips], df, "GEOID", "County", selected_metrics, name_col="NAME"
-    )
+    geo = DATA["county_geom_by_state"][state_fips]
+    return _build_choropleth_map(geo, df, "GEOID", "County", selected_metrics, name_col="NAME")
 
 
 def generate_zcta_map(selected_metrics, selected_dma, pop_min=None, normalize=False):
     """Render ZCTA choropleth map filtered to a single DMA."""
-    zcta_geom_select = zcta_geom[zcta_geom["dma"] == selected_dma].reset_index()
+    zcta_geom_select = DATA["zcta_geom"][DATA["zcta_geom"]["dma"] == selected_dma].reset_index()
     zcta_geom_select = zcta_geom_select[["ZCTA5CE20", "geometry"]].set_index(
         "ZCTA5CE20"
     )
     zcta_json_select = zcta_geom_select.to_json()
 
-    df = c_zcta_dma[c_zcta_dma["dma"] == selected_dma].reset_index(drop=True)
+    df = DATA["c_zcta_dma"][DATA["c_zcta_dma"]["dma"] == selected_dma].reset_index(drop=True)
     df = df.rename(columns={"zcta": "ZCTA5CE20"})
     df = df.loc[df[DEFAULT_VAR] >= (pop_min or 0)]
     if normalize:
@@ -1486,11 +1601,11 @@ def generate_tract_map(
     selected_metrics, selected_state, pop_min=None, exclude=None, normalize=False
 ):
     """Render census tract choropleth map for a single state."""
-    state_fips = state_name.loc[
-        state_name["state_NAME"] == selected_state, "state"
+    state_fips = DATA["state_name"].loc[
+        DATA["state_name"]["state_NAME"] == selected_state, "state"
     ].values[0]
 
-    df = c_tract.loc[c_tract["GEOID"].str[:2] == state_fips].reset_index(drop=True)
+    df = DATA["c_tract"].loc[DATA["c_tract"]["GEOID"].str[:2] == state_fips].reset_index(drop=True)
     if pop_min is not None:
         df = df.loc[df[DEFAULT_VAR] >= pop_min]
     if exclude:
@@ -1499,7 +1614,7 @@ def generate_tract_map(
         df = _normalize_df(df, selected_metrics)
 
     return _build_choropleth_map(
-        tract_geom_by_state[state_fips], df, "GEOID", "Tract", selected_metrics
+        DATA["tract_geom_by_state"][state_fips], df, "GEOID", "Tract", selected_metrics
     )
 
 
@@ -1508,8 +1623,8 @@ def generate_block_group_map(
 ):
     """Render block group choropleth map for NYC, LA, or SF."""
     county_fips = _city_fips[selected_city]
-    df = c_block_group.loc[
-        c_block_group["GEOID"].str[:5].isin(county_fips)
+    df = DATA["c_block_group"].loc[
+        DATA["c_block_group"]["GEOID"].str[:5].isin(county_fips)
     ].reset_index(drop=True)
     if pop_min is not None:
         df = df.loc[df[DEFAULT_VAR] >= pop_min]
@@ -1519,7 +1634,7 @@ def generate_block_group_map(
         df = _normalize_df(df, selected_metrics)
 
     return _build_choropleth_map(
-        block_group_geom_by_city[selected_city],
+        DATA["block_group_geom_by_city"][selected_city],
         df,
         "GEOID",
         "Block Group",
@@ -1529,25 +1644,26 @@ def generate_block_group_map(
 
 def generate_state_cd_map(selected_metrics, selected_state, normalize=False):
     """Render congressional district map filtered to a single state."""
+    state_name = DATA["state_name"]
     state_fips = state_name.loc[state_name["state_NAME"] == selected_state, "state"].values[0]
-    df = c_congressional_district.loc[
-        c_congressional_district["GEOID"].str[:2] == state_fips
-    ].reset_index(drop=True)
+    districts = DATA["c_congressional_district"]
+    df = districts.loc[districts["GEOID"].str[:2] == state_fips].reset_index(drop=True)
     if normalize:
         df = _normalize_df(df, selected_metrics)
-    geo = congressional_district_geom[
-        congressional_district_geom.index.str[:2] == state_fips
-    ].to_json()
+    geom = DATA["congressional_district_geom"]
+    geo = geom[geom.index.str[:2] == state_fips].to_json()
     return _build_choropleth_map(geo, df, "GEOID", "Congressional District", selected_metrics, name_col="NAME")
 
 
 def generate_congressional_district_map(selected_metrics, normalize=False, exclude_pr=False):
     """Render congressional district choropleth map for the full US."""
-    df = _normalize_df(c_congressional_district, selected_metrics) if normalize else c_congressional_district
+    df = DATA["c_congressional_district"]
+    if normalize:
+        df = _normalize_df(df, selected_metrics)
     if exclude_pr:
         df = df[df["GEOID"].str[:2] != "72"]
     return _build_choropleth_map(
-        congressional_district_geom_json,
+        DATA["congressional_district_geom_json"],
         df,
         "GEOID",
         "Congressional District",
@@ -1560,9 +1676,12 @@ def generate_congressional_district_map(selected_metrics, normalize=False, exclu
 
 
 _US_MAP_GEOS = {
-    "State": (state_metric_cols, generate_state_map),
-    "DMA": (dma_metric_cols, generate_dma_map),
-    "Congressional District": (congressional_district_metric_cols, generate_congressional_district_map),
+    "State": ("state_metric_cols", generate_state_map),
+    "DMA": ("dma_metric_cols", generate_dma_map),
+    "Congressional District": (
+        "congressional_district_metric_cols",
+        generate_congressional_district_map,
+    ),
 }
 
 
@@ -1573,7 +1692,7 @@ _US_MAP_GEOS = {
 )
 def update_us_map_metric_options(geo):
     cols, _ = _US_MAP_GEOS[geo]
-    return _make_options(cols), [DEFAULT_VAR]
+    return _make_options(DATA[cols]), [DEFAULT_VAR]
 
 
 @app.callback(
@@ -1589,11 +1708,11 @@ def update_us_map(metrics, geo, normalize, exclude_pr):
 
 
 _STATE_MAP_GEOS = {
-    "County": (county_metric_cols, generate_county_map),
-    "Congressional District": (congressional_district_metric_cols, generate_state_cd_map),
+    "County": ("county_metric_cols", generate_county_map),
+    "Congressional District": ("congressional_district_metric_cols", generate_state_cd_map),
 }
 if DEV_MODE:
-    _STATE_MAP_GEOS["Tract"] = (tract_metric_cols, generate_tract_map)
+    _STATE_MAP_GEOS["Tract"] = ("tract_metric_cols", generate_tract_map)
 
 
 @app.callback(
@@ -1603,7 +1722,7 @@ if DEV_MODE:
 )
 def update_state_map_metric_options(geo):
     cols, _ = _STATE_MAP_GEOS[geo]
-    return _make_options(cols), [DEFAULT_VAR]
+    return _make_options(DATA[cols]), [DEFAULT_VAR]
 
 
 @app.callback(
@@ -1621,13 +1740,11 @@ def toggle_state_map_tract_filters(geo):
     Input("state-map-state", "value"),
 )
 def update_state_map_exclude_options(geo, selected_state):
-    state_fips = state_name.loc[
-        state_name["state_NAME"] == selected_state, "state"
+    state_fips = DATA["state_name"].loc[
+        DATA["state_name"]["state_NAME"] == selected_state, "state"
     ].values[0]
-    if geo == "Tract":
-        options = sorted(c_tract.loc[c_tract["GEOID"].str[:2] == state_fips, "GEOID"].unique())
-    else:
-        options = sorted(c_county_state.loc[c_county_state["GEOID"].str[:2] == state_fips, "GEOID"].unique())
+    df = DATA["c_tract"] if geo == "Tract" else DATA["c_county_state"]
+    options = sorted(df.loc[df["GEOID"].str[:2] == state_fips, "GEOID"].unique())
     return options, []
 
 
@@ -1674,8 +1791,8 @@ if DEV_MODE:
     @app.callback(Output("block-group-exclude", "options"), Input("city-selector", "value"))
     def update_block_group_exclude_options(selected_city):
         return sorted(
-            c_block_group.loc[
-                c_block_group["GEOID"].str[:5].isin(_city_fips[selected_city]), "GEOID"
+            DATA["c_block_group"].loc[
+                DATA["c_block_group"]["GEOID"].str[:5].isin(_city_fips[selected_city]), "GEOID"
             ].unique()
         )
 
@@ -1705,7 +1822,7 @@ def load_scatter_preset(*_):
 )
 def update_scatter_options(geo):
     _, _, cols = SCATTER_GEOS[geo]
-    opts = _make_options(cols)
+    opts = _make_options(DATA[cols])
     return opts, opts, opts, opts
 
 
@@ -1718,10 +1835,10 @@ def update_scatter_options(geo):
 )
 def update_scatter_filter_options(geo):
     if geo == "County":
-        opts = sorted(c_county_state["state_NAME"].dropna().unique())
+        opts = sorted(DATA["c_county_state"]["state_NAME"].dropna().unique())
         return "Filter by State", [{"label": o, "value": o} for o in opts], [], False
     if geo == "ZCTA":
-        opts = sorted(c_zcta_dma["dma"].dropna().unique())
+        opts = sorted(DATA["c_zcta_dma"]["dma"].dropna().unique())
         return "Filter by DMA", [{"label": o, "value": o} for o in opts], [], False
     return "Filter", [], [], True
 
@@ -1742,7 +1859,8 @@ def update_scatter(
     if not x_metric or not y_metric:
         return px.scatter()
 
-    df, label_col, _ = SCATTER_GEOS[geo]
+    table, label_col, _ = SCATTER_GEOS[geo]
+    df = DATA[table]
 
     if filter_vals:
         if geo == "County":
@@ -1852,14 +1970,16 @@ def update_anim_scatter(
     if not x_metric or not y_metric:
         return px.scatter()
 
-    df, name_col = TIMESERIES_GEOS[geo_level]
+    cube = DATA[TIMESERIES_CUBES[geo_level]]
+    name_col = cube.name_col
 
     extra = [m for m in [color_metric, size_metric] if m]
-    cols = list(dict.fromkeys(["year", name_col, x_metric, y_metric] + extra))
-    plot_df = df[cols].dropna(subset=[x_metric, y_metric])
-
+    metrics = list(dict.fromkeys([x_metric, y_metric] + extra))
+    block = cube.block(metrics)
     if inflate:
-        plot_df = _apply_cpi(plot_df)
+        _apply_cpi(block, cube.years, metrics)
+    # Year-major rows: each animation frame is one values[:, year, :] slice
+    plot_df = cube.frame(block, metrics).dropna(subset=[x_metric, y_metric])
 
     if size_metric:
         plot_df = plot_df[plot_df[size_metric] > 0].dropna(subset=[size_metric])
@@ -1906,8 +2026,7 @@ def update_anim_scatter(
 
 @app.callback(Output("trends-geo", "options"), Input("trends-geo-level", "value"))
 def update_trends_geo_options(geo_level):
-    df, name_col = TIMESERIES_GEOS[geo_level]
-    return sorted(df[name_col].unique())
+    return sorted(DATA[TIMESERIES_CUBES[geo_level]].names)
 
 
 @app.callback(
@@ -1935,17 +2054,17 @@ def load_trends_preset(*_):
 def update_trends_chart(geo_level, geo_names, metric, inflate):
     if not geo_names or not metric:
         return px.line()
-    df, name_col = TIMESERIES_GEOS[geo_level]
-    plot_df = df[df[name_col].isin(geo_names)][["year", name_col, metric]].dropna(
-        subset=[metric]
-    )
+    cube = DATA[TIMESERIES_CUBES[geo_level]]
+    geos = cube.positions(geo_names)
+    block = cube.block([metric], geos)
     if inflate:
-        plot_df = _apply_cpi(plot_df)
+        _apply_cpi(block, cube.years, [metric])
+    plot_df = cube.frame(block, [metric], geos).dropna(subset=[metric])
     fig = px.line(
         plot_df,
         x="year",
         y=metric,
-        color=name_col,
+        color=cube.name_col,
         markers=True,
         color_discrete_sequence=px.colors.qualitative.Set2,
     )
@@ -1965,7 +2084,7 @@ def update_trends_chart(geo_level, geo_names, metric, inflate):
     [Input(f"corr-group-{i}", "n_clicks") for i in range(len(CORR_METRIC_GROUPS))],
 )
 def update_corr_options(geo_level, *_group_clicks):
-    _, cols = CORR_GEOS[geo_level]
+    cols = DATA[CORR_GEOS[geo_level][1]]
     opts = _make_options(cols)
     triggered = callback_context.triggered[0]["prop_id"]
     if "corr-group" in triggered:
@@ -1985,7 +2104,7 @@ def update_corr_options(geo_level, *_group_clicks):
 def update_corr_matrix(geo_level, selected_metrics):
     if not selected_metrics or len(selected_metrics) < 2:
         return px.imshow([[]], title="Select at least 2 metrics")
-    df, _ = CORR_GEOS[geo_level]
+    df = DATA[CORR_GEOS[geo_level][0]]
     available = [m for m in selected_metrics if m in df.columns]
     corr = df[available].corr()
     labels = [_metric_label(c) for c in corr.columns]
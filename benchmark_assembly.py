@@ -0,0 +1,87 @@
+"""Benchmark var-group chunk assembly on a synthetic nationwide tract payload.
+
+Compares the old fold of outer merges against census_frames.assemble_chunks on
+85k tracts x 600 estimate columns split into <=49-variable chunks, as returned by the API.
+
+    python benchmark_assembly.py [--rows 85000] [--cols 600]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from census_frames import assemble_chunks
+
+KEY_COLS = ["NAME", "state", "county", "tract"]
+MAX_VARS_PER_CALL = 49
+
+
+def _merge_chunks(chunk_dfs, key_cols):
+    """Previous implementation: one outer merge per var group on object-dtype strings."""
+    merged = chunk_dfs[0]
+    for _chunk in chunk_dfs[1:]:
+        keep = [c for c in _chunk.columns if c in key_cols or c not in merged.columns]
+        merged = merged.merge(_chunk[keep], how="outer", on=key_cols)
+    return merged.astype({c: float for c in merged.columns if c not in key_cols})
+
+
+def _synthetic_chunks(n_rows, n_cols, seed=0):
+    """Build API-shaped chunks: NAME, string estimates, then string FIPS keys."""
+    rng = np.random.default_rng(seed)
+    state = np.char.zfill(rng.integers(1, 57, n_rows).astype(str), 2)
+    county = np.char.zfill(rng.integers(1, 400, n_rows).astype(str), 3)
+    tract = np.char.zfill(np.arange(n_rows).astype(str), 6)
+    keys = pd.DataFrame(
+        {
+            "NAME": [f"Census Tract {t}" for t in tract],
+            "state": state,
+            "county": county,
+            "tract": tract,
+        }
+    )
+    # Share one str object per distinct value so the object arrays stay a pointer table
+    pool = np.array([str(v) for v in range(5000)], dtype=object)
+    values = pool[rng.integers(0, len(pool), (n_rows, n_cols))]
+    chunks = []
+    for start in range(0, n_cols, MAX_VARS_PER_CALL):
+        cols = [f"B99999_{i:03d}E" for i in range(start, min(start + MAX_VARS_PER_CALL, n_cols))]
+        body = pd.DataFrame(values[:, start:start + len(cols)], columns=cols)
+        chunks.append(pd.concat([keys[["NAME"]], body, keys[KEY_COLS[1:]]], axis=1))
+    return chunks
+
+
+def _time(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=85_000)
+    parser.add_argument("--cols", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = _synthetic_chunks(args.rows, args.cols)
+    print(f"{args.rows} rows x {args.cols} columns in {len(chunks)} chunks")
+
+    t_merge, merged = _time(_merge_chunks, chunks, KEY_COLS, repeat=args.repeat)
+    t_assemble, assembled = _time(assemble_chunks, chunks, KEY_COLS, repeat=args.repeat)
+
+    value_cols = [c for c in merged.columns if c not in KEY_COLS]
+    merged = merged.sort_values(KEY_COLS[1:]).reset_index(drop=True)
+    assembled = assembled.sort_values(KEY_COLS[1:]).reset_index(drop=True)
+    assert np.array_equal(merged[value_cols].to_numpy(), assembled[value_cols].to_numpy())
+
+    print(f"  outer-merge fold: {t_merge:.2f}s")
+    print(f"  assemble_chunks:  {t_assemble:.2f}s ({t_merge / t_assemble:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark the download pipeline end to end against the local mock Census API.
+
+Starts mock_census_api.py in-process, runs each pipeline script as a subprocess in a scratch
+directory (fresh response cache, synthetic zcta_to_dma.csv) with CENSUS_API_BASE pointed at
+the mock, and reports wall time, requests/second and the script's peak RSS.
+
+    python benchmark_pipeline.py [--scripts download.py download_timeseries.py]
+                                 [--latency 0.05] [--throttle-rate 0.02] [--counties 20]
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from mock_census_api import Geography, add_server_args, serve, server_kwargs
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _write_zcta_to_dma(workdir, zctas, n_dmas=20):
+    zcta_to_dma = pd.DataFrame(
+        {"zcta": zctas, "dma": [f"Mock DMA {i % n_dmas:02d}" for i in range(len(zctas))]}
+    )
+    zcta_to_dma.to_csv(os.path.join(workdir, "zcta_to_dma.csv"), index=False)
+
+
+def _run(script, args, env, workdir, verbose=False):
+    """Run one pipeline script; returns (exit code, wall seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, script), *args],
+        cwd=workdir,
+        env=env,
+        stdout=None if verbose else subprocess.DEVNULL,
+    )
+    # wait4 reports rusage for this child alone (getrusage(RUSAGE_CHILDREN) keeps the max)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    rss_mb = usage.ru_maxrss / (1024 if sys.platform != "darwin" else 1024**2)
+    return proc.returncode, wall, rss_mb
+
+
+def _run_report(metrics_dir):
+    """The metrics report the script wrote (FetchMetrics.write), or None if it didn't finish."""
+    reports = glob.glob(os.path.join(metrics_dir, "*.json"))
+    if not reports:
+        return None
+    with open(reports[0]) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scripts", nargs="+", default=["download.py", "download_timeseries.py"])
+    parser.add_argument("--script-args", default="--force", help="arguments for every script")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own logs")
+    add_server_args(parser)
+    args = parser.parse_args()
+
+    server, base_url, counts = serve(**server_kwargs(args))
+    geo = Geography(
+        counties=args.counties,
+        tracts=args.tracts,
+        block_groups=args.block_groups,
+        zctas=args.zctas,
+        districts=args.districts,
+    )
+    print(
+        f"Mock API at {base_url}: {len(geo.counties)} counties, {len(geo.tracts)} tracts, "
+        f"{len(geo.block_groups)} block groups, {len(geo.zctas)} ZCTAs; latency {args.latency}s, "
+        f"{args.error_rate:.0%} 503s, {args.throttle_rate:.0%} 429s"
+    )
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="census_bench_") as workdir:
+        _write_zcta_to_dma(workdir, geo.zctas)
+        env = {
+            **os.environ,
+            "CENSUS_API_BASE": base_url,
+            "CENSUS_CACHE_DIR": os.path.join(workdir, ".census_cache"),
+            "CENSUS_METRICS_DIR": os.path.join(workdir, ".metrics"),
+        }
+        for script in args.scripts:
+            shutil.rmtree(env["CENSUS_METRICS_DIR"], ignore_errors=True)
+            before = counts["requests"]
+            code, wall, rss_mb = _run(
+                script, args.script_args.split(), env, workdir, verbose=args.verbose
+            )
+            requests_served = counts["requests"] - before
+            report = _run_report(env["CENSUS_METRICS_DIR"]) or {}
+            latency = report.get("latency_seconds", {})
+            rows.append(
+                {
+                    "script": script,
+                    "exit": code,
+                    "wall_s": round(wall, 2),
+                    "requests": requests_served,
+                    "req_per_s": round(requests_served / wall, 1) if wall else 0.0,
+                    "p50_ms": round(latency.get("p50", 0) * 1000, 1),
+                    "p99_ms": round(latency.get("p99", 0) * 1000, 1),
+                    "retries": report.get("requests", {}).get("retries", 0),
+                    "peak_rss_mb": round(rss_mb, 1),
+                }
+            )
+    server.shutdown()
+
+    print(pd.DataFrame(rows).to_string(index=False))
+    if any(r["exit"] != 0 for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
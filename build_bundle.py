@@ -0,0 +1,76 @@
+"""Package the app's data files into one bundle (census_bundle.py) for deployment.
+
+Bundles every file in fetch_data.FILES plus the DMA polygons shipped with the app:
+Parquet tables as they are, CSVs zstd-compressed, each shapefile (all its sidecar files) as
+one GeoParquet member and each timeseries table as its saved cube (the table itself when
+no cube was saved, for the app to pivot). Upload the result to the bucket and set
+USE_BUNDLE=true, so the app fetches one object and maps it. DEV_MODE=true includes the
+tract and block group files, as in fetch_data.py.
+"""
+
+import os
+import sys
+import time
+
+import geopandas as gpd
+
+from census_bundle import BundleWriter
+from census_cube import TimeseriesCube
+from fetch_data import ACS_YEAR, BUNDLE_FILE, DEV_MODE, FILES
+
+# Read by app.py from the image rather than the bucket; bundled so one file has everything
+APP_FILES = ["dma_polygons.geojson", "dma_polygon_map.csv"]
+
+
+def _log(msg):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def _size(n):
+    return f"{n / 1e6:.1f} MB"
+
+
+def build(path=BUNDLE_FILE, names=None):
+    """Write the bundle for ``names`` (default: FILES + APP_FILES); returns its index."""
+    names = FILES + APP_FILES if names is None else names
+    missing = [n for n in names if not os.path.exists(n)]
+    if missing:
+        raise FileNotFoundError(f"missing bundle inputs: {missing}")
+    writer = BundleWriter(path)
+    try:
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if name.startswith("c_timeseries_") and os.path.isdir(f"{stem}_cube"):
+                # The app reads timeseries as cubes; download_timeseries.py saves both
+                name = f"{stem}_cube"
+                writer.add_cube(name, TimeseriesCube.load(name))
+            elif ext == ".parquet":
+                with open(name, "rb") as f:
+                    writer.add_file(name, f.read())
+            elif ext == ".csv":
+                with open(name, "rb") as f:
+                    writer.add_file(name, f.read(), compress=True)
+            elif ext in (".shp", ".geojson"):
+                writer.add_geo(name, gpd.read_file(name))
+            else:
+                continue  # shapefile sidecars, read with their .shp
+            _log(f"  {name}: {_size(writer.members[name]['length'])}")
+    except BaseException:
+        writer.abort()
+        raise
+    built = time.strftime("%Y-%m-%d %H:%M:%S")
+    return writer.close(acs_year=ACS_YEAR, dev_mode=DEV_MODE, built=built)
+
+
+if __name__ == "__main__":
+    _start = time.time()
+    _log(f"Building {BUNDLE_FILE}{' (dev)' if DEV_MODE else ''}...")
+    try:
+        _index = build()
+    except FileNotFoundError as e:
+        _log(str(e))
+        sys.exit(1)
+    _log(
+        f"Done: {BUNDLE_FILE} version {_index['version']}, {len(_index['members'])} members, "
+        f"{_size(os.path.getsize(BUNDLE_FILE))} ({time.time() - _start:.1f}s)."
+    )
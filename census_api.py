@@ -0,0 +1,493 @@
+"""Shared helpers for talking to the Census API from the download scripts."""
+
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Overridable so the pipeline can run against mock_census_api.py
+API_BASE = os.getenv("CENSUS_API_BASE", "https://api.census.gov").rstrip("/")
+CACHE_DIR = os.getenv("CENSUS_CACHE_DIR", ".census_cache")
+CACHE_TTL = 90 * 24 * 3600  # ACS vintages are immutable once released; this just bounds staleness
+CACHE_MAX_BYTES = 2 * 1024**3
+METRICS_DIR = os.getenv("CENSUS_METRICS_DIR", ".metrics")
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of raw Census API response bodies.
+
+    Entries are keyed on the request URL plus its params (minus the API key) and stored
+    gzip-compressed under ``root/<first two hex chars>/<sha256>.json.gz``. A hit refreshes
+    the entry's mtime, so ``evict`` drops expired entries first and then the least recently
+    used ones until the cache fits in ``max_bytes``.
+    """
+
+    def __init__(self, root=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, refresh=False):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh  # skip reads but still write, i.e. repopulate from the API
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url, params):
+        cacheable = {k: v for k, v in (params or {}).items() if k != "key" and v is not None}
+        blob = json.dumps([url, sorted(cacheable.items())], separators=(",", ":"))
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def get(self, url, params):
+        """Return the cached response body as bytes, or None on a miss."""
+        path = self._path(self.key(url, params))
+        if self.refresh or not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            # Another process may evict or replace the entry at any point
+            expired = self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl
+            if not expired:
+                with gzip.open(path, "rb") as f:
+                    body = f.read()
+        except (OSError, EOFError):
+            expired = True
+        if expired:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return body
+
+    def put(self, url, params, body):
+        path = self._path(self.key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under ``max_bytes``."""
+        if not os.path.isdir(self.root):
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            # Entries can vanish mid-scan: another process evicting, a writer renaming its tmp
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    if self.ttl is not None and now - st.st_mtime > self.ttl:
+                        os.remove(path)
+                        removed += 1
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                removed += 1
+            total -= size
+        return removed
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def summary(self):
+        return f"cache: {self.hits} hits, {self.misses} misses"
+
+
+class CheckpointStore:
+    """Run-scoped record of completed work units so an interrupted download can resume.
+
+    Each unit's response body is written gzip-compressed to ``root/units/`` and then
+    appended to ``root/manifest.jsonl``, so a unit only counts as done once both are on
+    disk. The first manifest line holds a fingerprint of the run configuration; a store
+    left behind by a run with a different fingerprint is discarded instead of resumed.
+    Unlike ``ResponseCache`` it ignores ``--refresh-cache`` and is cleared once the run's
+    outputs are saved.
+    """
+
+    def __init__(self, root, fingerprint):
+        self.root = root
+        self.fingerprint = fingerprint
+        self.manifest_path = os.path.join(root, "manifest.jsonl")
+        self.done = {}
+        if os.path.exists(self.manifest_path):
+            self._load()
+        if not self.done:
+            self._start()
+
+    def _load(self):
+        with open(self.manifest_path) as f:
+            lines = [json.loads(line) for line in f if line.strip().endswith("}")]
+        if not lines or lines[0].get("fingerprint") != self.fingerprint:
+            self.clear()
+            return
+        for entry in lines[1:]:
+            if os.path.exists(os.path.join(self.root, entry["file"])):
+                self.done[entry["unit"]] = entry["file"]
+
+    def _start(self):
+        os.makedirs(os.path.join(self.root, "units"), exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            f.write(json.dumps({"fingerprint": self.fingerprint, "started": time.time()}) + "\n")
+
+    @staticmethod
+    def unit_id(*parts):
+        return "|".join(str(p) for p in parts)
+
+    def get(self, unit):
+        """Return the checkpointed body for ``unit`` as bytes, or None if it isn't done."""
+        name = self.done.get(unit)
+        if name is None:
+            return None
+        with gzip.open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+    def put(self, unit, body):
+        name = os.path.join("units", f"{hashlib.sha256(unit.encode()).hexdigest()}.json.gz")
+        path = os.path.join(self.root, name)
+        with gzip.open(f"{path}.tmp", "wb", compresslevel=6) as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps({"unit": unit, "file": name, "at": time.time()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[unit] = name
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.done = {}
+
+
+def plan_calls(tables, max_vars):
+    """Pack the variables of every table into the fewest API calls of at most ``max_vars``.
+
+    ``tables`` maps a table id to its variable list. Variables are laid out largest table
+    first and the combined list is cut every ``max_vars`` entries, which reaches the
+    ceil(total / max_vars) minimum while each table only breaks where a call fills up.
+    Returns ``{call id: comma-joined variables}`` in the form the request loop expects.
+    """
+    ordered = sorted(tables.items(), key=lambda kv: -len(kv[1]))
+    stream = list(dict.fromkeys(v for _, vars_list in ordered for v in vars_list))
+    return {
+        f"call{i:02d}": ",".join(stream[start:start + max_vars])
+        for i, start in enumerate(range(0, len(stream), max_vars))
+    }
+
+
+class RateController:
+    """Adaptive (AIMD) concurrency limit shared by every worker hitting the Census API.
+
+    Each fast 200 raises the limit by ``1 / limit`` (about +1 per round trip of in-flight
+    requests). A 429, a 5xx or a timeout halves it, at most once per ``cooldown`` seconds so
+    one burst of failures counts as a single congestion signal. A ``Retry-After`` header
+    pauses new requests from all workers until it expires. Thread-safe; asyncio callers run
+    ``fetch`` in a worker thread.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, slow=10.0, cooldown=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow = slow
+        self.cooldown = cooldown
+        self.peak = self.limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.throttled = 0
+        self.errors = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, status=None, latency=0.0, retry_after=None):
+        """Record one finished request; ``status`` is None for timeouts/connection errors."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status == 429 or status is None or status >= 500:
+                if status == 429:
+                    self.throttled += 1
+                else:
+                    self.errors += 1
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif status < 400 and latency < self.slow:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 2),
+            "peak": round(self.peak, 2),
+            "maximum": self.maximum,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+    def summary(self):
+        return (
+            f"rate: limit {self.limit:.1f} (peak {self.peak:.1f}), "
+            f"{self.throttled} throttled, {self.errors} errors"
+        )
+
+
+class FetchMetrics:
+    """Thread-safe record of every HTTP attempt made through ``fetch`` in one run.
+
+    Tracks per-attempt latency (kept raw for percentiles and bucketed for a histogram),
+    payload bytes, status codes, retries, time slept in backoff and time spent waiting on
+    the rate controller (both summed across worker threads), plus wall time of named
+    pipeline stages (``stage``). ``write``
+    dumps it all as a JSON report so a slow run can be pinned on the API, on parsing or on
+    the concurrency settings.
+    """
+
+    BUCKETS_MS = [25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+    def __init__(self):
+        self.started = time.time()
+        self.latencies = []
+        self.statuses = {}
+        self.payload_bytes = 0
+        self.wire_bytes = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.throttle_wait_seconds = 0.0
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def request(self, status, latency, payload=0, wire=0):
+        """Record one attempt; ``status`` is None for timeouts/connection errors."""
+        with self._lock:
+            self.latencies.append(latency)
+            key = str(status) if status is not None else "error"
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            self.payload_bytes += payload
+            self.wire_bytes += wire
+
+    def retry(self, backoff):
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += backoff
+
+    def throttle_wait(self, seconds):
+        with self._lock:
+            self.throttle_wait_seconds += seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Accumulate wall time and call count for a named stage (decode, assemble, ...)."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                seconds, calls = self.stages.get(name, (0.0, 0))
+                self.stages[name] = (seconds + elapsed, calls + 1)
+
+    def add_stages(self, stages):
+        """Add stage timings recorded elsewhere, e.g. the ``stages`` of a worker process."""
+        with self._lock:
+            for name, (seconds, calls) in stages.items():
+                total, count = self.stages.get(name, (0.0, 0))
+                self.stages[name] = (total + seconds, count + calls)
+
+    def _latency_report(self):
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return {}
+        histogram = {}
+        below = 0
+        for bound in self.BUCKETS_MS:
+            upto = bisect.bisect_right(ordered, bound / 1000)
+            histogram[f"<={bound}ms"] = upto - below
+            below = upto
+        histogram[f">{self.BUCKETS_MS[-1]}ms"] = len(ordered) - below
+        pct = {
+            f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4)
+            for p in (50, 90, 99)
+        }
+        return {"mean": round(sum(ordered) / len(ordered), 4), **pct,
+                "max": round(ordered[-1], 4), "histogram": histogram}
+
+    def summary(self):
+        with self._lock:
+            n = len(self.latencies)
+            return (
+                f"http: {n} attempts, {self.retries} retries, "
+                f"{self.payload_bytes / 1e6:.1f} MB, {self.throttle_wait_seconds:.1f}s throttled"
+            )
+
+    def write(self, name, root=METRICS_DIR, **extra):
+        """Write the run report to ``root/<name>_<timestamp>.json`` and return its path."""
+        with self._lock:
+            report = {
+                "run": name,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_seconds": round(time.time() - self.started, 3),
+                "requests": {
+                    "attempts": len(self.latencies),
+                    "statuses": dict(sorted(self.statuses.items())),
+                    "retries": self.retries,
+                    "backoff_seconds": round(self.backoff_seconds, 3),
+                    "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                    "payload_bytes": self.payload_bytes,
+                    "wire_bytes": self.wire_bytes,
+                },
+                "latency_seconds": self._latency_report(),
+                "stages": {
+                    k: {"seconds": round(sec, 3), "calls": calls}
+                    for k, (sec, calls) in self.stages.items()
+                },
+                **extra,
+            }
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, f"{name}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+def make_session(pool_size=16, hosts=2):
+    """Pooled, keep-alive HTTP session shared by every worker thread in a run.
+
+    One urllib3 pool per host holds up to ``pool_size`` connections (match the rate
+    controller's ceiling), and ``pool_block`` makes extra threads wait for a free
+    connection instead of opening throwaway ones, so TLS handshakes happen once per
+    connection rather than once per request. Responses are requested gzip-compressed.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+
+def connection_stats(session):
+    """Connections opened and requests sent across the session's pools."""
+    opened = sent = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            sent += pool.num_requests
+    return {"opened": opened, "requests": sent}
+
+
+def connection_summary(session):
+    """Connections opened vs requests sent across the session's pools."""
+    stats = connection_stats(session)
+    opened, sent = stats["opened"], stats["requests"]
+    reused = 1 - opened / sent if sent else 0.0
+    return f"connections: {opened} opened for {sent} requests ({reused:.0%} reused)"
+
+
+def _retry_after(resp):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def fetch(
+    url,
+    params,
+    controller,
+    session=requests,
+    timeout=30,
+    max_retries=3,
+    metrics=None,
+):
+    """GET ``url`` through ``session`` under ``controller``, retrying with exponential backoff.
+
+    Returns the last response, which is non-200 if every attempt failed or the request was
+    rejected: a 4xx other than 429 (unknown variable, geography not published for that
+    year, ...) is returned at once, since retrying it cannot succeed. Raises the last
+    ``requests.RequestException`` if no attempt got a response at all. Backoff is
+    ``2**attempt`` seconds, or longer if the API sent Retry-After. Every attempt, retry and
+    rate-controller wait is recorded in ``metrics`` if given.
+    """
+    for attempt in range(max_retries):
+        waited = time.monotonic()
+        controller.acquire()
+        start = time.monotonic()
+        if metrics is not None:
+            metrics.throttle_wait(start - waited)
+        try:
+            resp = session.get(url, params=params, timeout=timeout)
+        except requests.exceptions.RequestException:
+            latency = time.monotonic() - start
+            controller.release(None, latency)
+            if metrics is not None:
+                metrics.request(None, latency)
+            if attempt == max_retries - 1:
+                raise
+            if metrics is not None:
+                metrics.retry(2**attempt)
+            time.sleep(2**attempt)
+            continue
+        latency = time.monotonic() - start
+        retry_after = _retry_after(resp)
+        controller.release(resp.status_code, latency, retry_after)
+        if metrics is not None:
+            wire = int(resp.headers.get("Content-Length") or 0)
+            metrics.request(resp.status_code, latency, len(resp.content), wire)
+        if resp.status_code == 200 or (400 <= resp.status_code < 500 and resp.status_code != 429):
+            return resp
+        if attempt < max_retries - 1:
+            backoff = max(2**attempt, retry_after or 0)
+            if metrics is not None:
+                metrics.retry(backoff)
+            time.sleep(backoff)
+    return resp
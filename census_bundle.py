@@ -0,0 +1,138 @@
+"""One versioned file holding every data file the app reads, mapped instead of parsed."""
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from census_cube import TimeseriesCube
+
+MAGIC = b"CENSUSB1"
+FORMAT = 1
+# Members start on 64-byte boundaries so mapped arrays are aligned for numpy
+_ALIGN = 64
+
+
+class BundleWriter:
+    """Write members to a bundle file one at a time, then the index.
+
+    A bundle is ``MAGIC``, the members, a JSON index, the index length (8 bytes, little
+    endian) and ``MAGIC`` again. Members keep their source file names:
+
+    - ``add_file`` stores bytes as they are (Parquet, already compressed) or zstd-compressed
+    - ``add_geo`` stores a GeoDataFrame as zstd GeoParquet, so no shapefile parsing at load
+    - ``add_cube`` stores a TimeseriesCube's array raw, so the reader maps it without a copy
+
+    The version in the index is a hash of every member. Writes go to a temp file that
+    replaces ``path`` only on ``close``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.members = {}
+        self._digest = hashlib.sha256()
+        self._file = open(self.tmp_path, "wb")
+        self._file.write(MAGIC)
+
+    def _add(self, name, data, **entry):
+        if name in self.members:
+            raise ValueError(f"{name} is already in the bundle")
+        offset = -(-self._file.tell() // _ALIGN) * _ALIGN
+        self._file.write(b"\0" * (offset - self._file.tell()))
+        self._file.write(data)
+        self.members[name] = {**entry, "offset": offset, "length": len(data)}
+        self._digest.update(f"{name}\0{len(data)}\0".encode())
+        self._digest.update(data)
+
+    def add_file(self, name, data, compress=False):
+        if compress:
+            packed = pa.compress(data, codec="zstd", asbytes=True)
+            self._add(name, packed, kind="file", codec="zstd", size=len(data))
+        else:
+            self._add(name, data, kind="file")
+
+    def add_geo(self, name, gdf):
+        buf = io.BytesIO()
+        gdf.to_parquet(buf, compression="zstd")
+        self._add(name, buf.getvalue(), kind="geo")
+
+    def add_cube(self, name, cube):
+        values = np.ascontiguousarray(cube.values, dtype="<f8")
+        self._add(name, values.tobytes(), kind="cube", shape=list(values.shape), **cube.index())
+
+    def close(self, **info):
+        """Write the index (with any extra ``info``) and move the bundle into place."""
+        index = {
+            "format": FORMAT,
+            "version": self._digest.hexdigest()[:16],
+            **info,
+            "members": self.members,
+        }
+        header = json.dumps(index).encode()
+        self._file.write(header)
+        self._file.write(len(header).to_bytes(8, "little"))
+        self._file.write(MAGIC)
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return index
+
+    def abort(self):
+        """Discard a partly written bundle."""
+        self._file.close()
+        os.remove(self.tmp_path)
+
+
+class Bundle:
+    """A bundle file memory-mapped read-only; members are read from the map, not from files.
+
+    ``open`` returns a file-like object for pandas/geopandas readers, ``geo`` a GeoDataFrame
+    and ``cube`` a TimeseriesCube whose array is a view of the map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = pa.memory_map(path)
+        self._buffer = self._map.read_buffer()
+        size = self._buffer.size
+        tail = self._buffer.slice(size - 16).to_pybytes()
+        if self._buffer.slice(0, len(MAGIC)).to_pybytes() != MAGIC or tail[8:] != MAGIC:
+            raise ValueError(f"{path} is not a data bundle")
+        length = int.from_bytes(tail[:8], "little")
+        self.index = json.loads(self._buffer.slice(size - 16 - length, length).to_pybytes())
+        if self.index["format"] != FORMAT:
+            raise ValueError(f"{path} has bundle format {self.index['format']}, not {FORMAT}")
+        self.version = self.index["version"]
+        self.members = self.index["members"]
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def _member(self, name, kind):
+        entry = self.members[name]
+        if entry["kind"] != kind:
+            raise TypeError(f"{name} is a {entry['kind']} member, not {kind}")
+        return entry, self._buffer.slice(entry["offset"], entry["length"])
+
+    def open(self, name):
+        """File-like view of a ``file`` member, decompressed if it was stored compressed."""
+        entry, data = self._member(name, "file")
+        if entry.get("codec") == "zstd":
+            return io.BytesIO(
+                pa.decompress(data, decompressed_size=entry["size"], codec="zstd", asbytes=True)
+            )
+        return pa.BufferReader(data)
+
+    def geo(self, name):
+        import geopandas as gpd
+
+        _, data = self._member(name, "geo")
+        return gpd.read_parquet(pa.BufferReader(data))
+
+    def cube(self, name):
+        entry, data = self._member(name, "cube")
+        values = np.frombuffer(data, dtype="<f8").reshape(entry["shape"])
+        return TimeseriesCube.from_index(values, entry)
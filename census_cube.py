@@ -0,0 +1,165 @@
+"""Dense geography x year x metric arrays for the timeseries tabs."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class TimeseriesCube:
+    """A timeseries as one dense float64 array indexed ``values[geography, year, metric]``.
+
+    Geographies are indexed by a stable id (state name, county/tract GEOID, ZCTA) and labelled
+    with their latest display name; ``name_index`` maps a display name to its row. A trend line
+    is then ``values[g, :, m]`` and an animation frame ``values[:, y, :]``, slices instead of
+    DataFrame filters. (geography, year) pairs missing from the source table are NaN.
+
+    ``save`` writes the array as ``values.npy`` beside an ``index.json`` and ``load``
+    memory-maps it read-only, so a large cube (tracts) costs only the pages a callback touches.
+    """
+
+    def __init__(self, values, geo_ids, names, years, metrics, name_col):
+        self.values = values
+        self.geo_ids = list(geo_ids)
+        self.names = np.asarray(names, dtype=object)
+        self.years = np.asarray(years, dtype="int64")
+        self.metrics = list(metrics)
+        self.name_col = name_col
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+        self.metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+    @staticmethod
+    def _metric_columns(df, exclude):
+        return [
+            c for c in df.columns
+            if c not in exclude and pd.api.types.is_numeric_dtype(df[c].dtype)
+        ]
+
+    @staticmethod
+    def _latest_names(keys, id_col, name_col):
+        """Display name of every id from its latest year (names drift, e.g. tract formats)."""
+        if id_col == name_col:
+            ids = keys[id_col].unique()
+            return pd.Series(ids, index=ids)
+        latest = keys.sort_values("year").drop_duplicates(id_col, keep="last")
+        return latest.set_index(id_col)[name_col]
+
+    @classmethod
+    def from_frame(cls, df, id_col, name_col, metrics=None):
+        """Pivot a long table (one row per geography and year) into a cube in memory.
+
+        ``metrics`` defaults to every numeric column other than the keys and ``year``.
+        """
+        if metrics is None:
+            metrics = cls._metric_columns(df, {id_col, name_col, "year"})
+        geo_codes, geo_ids = pd.factorize(df[id_col].astype(object), sort=True)
+        year_codes, years = pd.factorize(df["year"], sort=True)
+        values = np.full((len(geo_ids), len(years), len(metrics)), np.nan)
+        values[geo_codes, year_codes] = df[metrics].to_numpy(dtype="float64")
+        names = cls._latest_names(
+            df[list(dict.fromkeys([id_col, name_col, "year"]))].astype({id_col: object}),
+            id_col,
+            name_col,
+        )
+        return cls(values, geo_ids, names.reindex(geo_ids).to_numpy(), years, metrics, name_col)
+
+    @classmethod
+    def write_partitions(cls, path, files, id_col, name_col):
+        """Build an on-disk cube at ``path`` from year-partition files, one year in memory.
+
+        The geography and year axes come from a first pass over the key columns only; the
+        second pass fills the memory-mapped array a partition at a time.
+        """
+        keys = pd.concat(
+            [pd.read_parquet(f, columns=list(dict.fromkeys([id_col, name_col, "year"])))
+             for f in files],
+            ignore_index=True,
+        ).astype({id_col: object})
+        geo_ids = pd.Index(keys[id_col].unique()).sort_values()
+        years = np.sort(keys["year"].unique())
+        names = cls._latest_names(keys, id_col, name_col).reindex(geo_ids).to_numpy()
+        metrics = cls._metric_columns(pd.read_parquet(files[0]), {id_col, name_col, "year"})
+        del keys
+
+        os.makedirs(path, exist_ok=True)
+        values = np.lib.format.open_memmap(
+            os.path.join(path, "values.npy"),
+            mode="w+",
+            dtype="float64",
+            shape=(len(geo_ids), len(years), len(metrics)),
+        )
+        values[:] = np.nan
+        for f in files:
+            part = pd.read_parquet(f, columns=[id_col, "year", *metrics])
+            rows = geo_ids.get_indexer(part[id_col].astype(object))
+            cols = np.searchsorted(years, part["year"].to_numpy())
+            values[rows, cols] = part[metrics].to_numpy(dtype="float64")
+        values.flush()
+        del values
+        cube = cls(None, geo_ids, names, years, metrics, name_col)
+        cube._write_index(path)
+        return cls.load(path)
+
+    def index(self):
+        """The axes and labels of the cube, as ``save`` writes them to ``index.json``."""
+        return {
+            "geo_ids": [str(g) for g in self.geo_ids],
+            "names": [str(n) for n in self.names],
+            "years": self.years.tolist(),
+            "metrics": self.metrics,
+            "name_col": self.name_col,
+        }
+
+    def _write_index(self, path):
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump(self.index(), f)
+
+    def save(self, path):
+        """Write ``values.npy`` and ``index.json`` under the directory ``path``."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "values.npy"), self.values)
+        self._write_index(path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a cube written by ``save`` or ``write_partitions``."""
+        with open(os.path.join(path, "index.json")) as f:
+            index = json.load(f)
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        return cls.from_index(values, index)
+
+    @classmethod
+    def from_index(cls, values, index):
+        """Cube over ``values`` labelled by an ``index()`` dict."""
+        return cls(
+            values,
+            index["geo_ids"],
+            index["names"],
+            index["years"],
+            index["metrics"],
+            index["name_col"],
+        )
+
+    def positions(self, names):
+        """Row positions of the known display ``names``, in the given order."""
+        return np.array([self.name_index[n] for n in names if n in self.name_index], dtype=int)
+
+    def block(self, metrics, geos=None):
+        """Copy of ``values[geos, :, metrics]`` (all geographies when ``geos`` is None)."""
+        cols = [self.metric_index[m] for m in metrics]
+        rows = np.arange(len(self.names)) if geos is None else geos
+        return np.asarray(self.values[np.ix_(rows, np.arange(len(self.years)), cols)])
+
+    def frame(self, block, metrics, geos=None):
+        """Long frame of a ``block``: one row per (year, geography), year-major like frames."""
+        n_geo, n_year = block.shape[:2]
+        names = self.names if geos is None else self.names[geos]
+        flat = block.transpose(1, 0, 2).reshape(n_year * n_geo, len(metrics))
+        return pd.DataFrame(
+            {
+                "year": np.repeat(self.years, n_geo),
+                self.name_col: np.tile(names, n_year),
+                **{m: flat[:, j] for j, m in enumerate(metrics)},
+            }
+        )
@@ -0,0 +1,252 @@
+"""DataFrame helpers shared by the Census download scripts."""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Census placeholder estimates (not available, suppressed, too few samples, ...) — all become NaN
+CENSUS_SENTINELS = np.array(
+    [-999999999, -888888888, -666666666, -555555555, -333333333, -222222222], dtype="float64"
+)
+
+
+def decode_response(body, key_cols):
+    """Decode a Census API JSON body straight into a typed frame.
+
+    The row lists are viewed as one object array of references (no per-cell copies), the
+    estimate columns are parsed into a single float64 block with every Census sentinel
+    mapped to NaN, and only ``key_cols`` (NAME and FIPS codes) stay as strings. This skips
+    the all-object DataFrame the pipeline used to build and cast later.
+    """
+    rows = json.loads(body)
+    header = rows[0]
+    cells = np.array(rows[1:], dtype=object).reshape(len(rows) - 1, len(header))
+    value_idx = [i for i, c in enumerate(header) if c not in key_cols]
+    try:
+        values = cells[:, value_idx].astype("float64")
+    except (TypeError, ValueError):
+        # Non-numeric annotation codes: fall back to a per-column coercing parse
+        values = np.empty((len(cells), len(value_idx)), dtype="float64")
+        for j, i in enumerate(value_idx):
+            values[:, j] = pd.to_numeric(cells[:, i], errors="coerce")
+    values[np.isin(values, CENSUS_SENTINELS)] = np.nan
+
+    # Keep the API's column order: NAME first, then estimates, then geography codes
+    first_value = value_idx[0] if value_idx else len(header)
+    leading = {c: cells[:, i] for i, c in enumerate(header[:first_value]) if c in key_cols}
+    trailing = {
+        c: cells[:, i] for i, c in enumerate(header) if c in key_cols and i > first_value
+    }
+    return pd.concat(
+        [
+            pd.DataFrame(leading),
+            pd.DataFrame(values, columns=[header[i] for i in value_idx], copy=False),
+            pd.DataFrame(trailing),
+        ],
+        axis=1,
+        copy=False,
+    )
+
+
+def _align_chunks(chunk_dfs, fips_cols):
+    """Reindex chunks whose rows differ onto the union of their FIPS keys."""
+    indexed = [chunk.set_index(fips_cols) for chunk in chunk_dfs]
+    index = indexed[0].index
+    for chunk in indexed[1:]:
+        if not chunk.index.equals(index):
+            index = index.union(chunk.index)
+    aligned = [chunk.reindex(index).reset_index(drop=True) for chunk in indexed]
+    return aligned, index.to_frame(index=False)
+
+
+def assemble_chunks(chunk_dfs, key_cols):
+    """Combine the per-var-group responses for one geography into a single wide frame.
+
+    Chunks are aligned on their FIPS key columns once (a no-op when the API returned the
+    rows in the same order, which is the usual case), and every estimate column is parsed
+    straight into one preallocated float64 block. This replaces a fold of outer merges,
+    which cost one hash join and one full copy of the object-dtype frame per group.
+    ``NAME`` and the FIPS keys stay strings; rows missing from some chunks are NaN, as
+    with the old outer merges.
+    """
+    fips_cols = [c for c in key_cols if c != "NAME"]
+    keys = chunk_dfs[0][fips_cols].reset_index(drop=True)
+    if not all(chunk[fips_cols].reset_index(drop=True).equals(keys) for chunk in chunk_dfs[1:]):
+        chunk_dfs, keys = _align_chunks(chunk_dfs, fips_cols)
+
+    seen = set(key_cols)
+    plan = []
+    for chunk in chunk_dfs:
+        new_cols = [c for c in chunk.columns if c not in seen]
+        seen.update(new_cols)
+        plan.append((chunk, new_cols))
+
+    value_cols = [c for _, cols in plan for c in cols]
+    # Column-major so each column write is contiguous and pandas can take the block as-is
+    values = np.empty((len(keys), len(value_cols)), dtype="float64", order="F")
+    names = None
+    pos = 0
+    for chunk, cols in plan:
+        if "NAME" in chunk.columns and (names is None or names.isna().any()):
+            names = chunk["NAME"] if names is None else names.fillna(chunk["NAME"])
+        for col in cols:
+            # Decoded chunks are already float; numpy parses any raw string columns here
+            values[:, pos] = chunk[col].to_numpy()
+            pos += 1
+
+    return pd.concat(
+        [
+            pd.DataFrame({"NAME": names.to_numpy()}),
+            pd.DataFrame(values, columns=value_cols, copy=False),
+            keys,
+        ],
+        axis=1,
+        copy=False,
+    )
+
+
+# float32 holds integers exactly only up to 2**24; larger counts (state populations) keep float64
+_FLOAT32_EXACT = 2**24
+
+
+def arrow_schema(df):
+    """Explicit Arrow schema for an output table.
+
+    String columns (names and FIPS/GEOID keys) are dictionary-encoded so zero-padded codes
+    survive without dtype hints, integer columns keep their type, and float metrics are
+    stored as float32 unless a column holds counts too large for float32 to represent exactly.
+    """
+    fields = []
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s.dtype):
+            typ = pa.from_numpy_dtype(s.dtype)
+        elif pd.api.types.is_numeric_dtype(s.dtype):
+            large = np.nanmax(np.abs(s.to_numpy(dtype="float64")), initial=0) >= _FLOAT32_EXACT
+            typ = pa.float64() if large else pa.float32()
+        else:
+            typ = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(str(col), typ))
+    return pa.schema(fields)
+
+
+def write_table(df, path):
+    """Write ``df`` to a zstd-compressed Parquet file using ``arrow_schema``.
+
+    The file is written under a temporary name and renamed into place, so an interrupted
+    write never leaves a truncated file at ``path``.
+    """
+    table = pa.Table.from_pandas(df, schema=arrow_schema(df), preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_table(source):
+    """Read a table written by ``write_table``/``TableWriter`` with its keys as plain strings.
+
+    Dictionary-encoded columns would otherwise load as ``category``, whose merges, ``isin``
+    filters and unique values behave differently from the object strings of the old CSVs.
+    """
+    table = pq.read_table(source)
+    schema = pa.schema(
+        [field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+         for field in table.schema]
+    )
+    return table.cast(schema).to_pandas()
+
+
+class TableWriter:
+    """Append frames to one Parquet file as row groups, for outputs produced piece by piece.
+
+    The schema is set by the first frame (``arrow_schema``); later frames are reindexed
+    to its columns, so a piece missing a var group gets nulls instead of breaking the file.
+    A later frame with counts too large for a float32 column widens that column to float64,
+    rewriting the rows already written, so no count is silently rounded.
+    Writes go to a temporary file that replaces ``path`` only on ``close``, so an
+    interrupted run never leaves a truncated output that looks complete. Thread-safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.schema = None
+        self.rows = 0
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _widen(self, frame_schema):
+        """Promote float32 columns that ``frame_schema`` needs as float64, rewriting the file."""
+        def _needs_float64(field):
+            needed = frame_schema.field(field.name).type
+            return field.type == pa.float32() and needed == pa.float64()
+
+        widened = pa.schema(
+            [field.with_type(pa.float64()) if _needs_float64(field) else field
+             for field in self.schema]
+        )
+        if widened.equals(self.schema):
+            return
+        self._writer.close()
+        written = pq.read_table(self.tmp_path, schema=self.schema).cast(widened)
+        self.schema = widened
+        self._writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd")
+        self._writer.write_table(written)
+
+    def write(self, df):
+        with self._lock:
+            if self._writer is None:
+                self.schema = arrow_schema(df)
+                self._writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd")
+            df = df.reindex(columns=self.schema.names)
+            self._widen(arrow_schema(df))
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            self._writer.write_table(table)
+            self.rows += len(df)
+
+    def close(self):
+        with self._lock:
+            if self._writer is None:
+                raise ValueError(f"no rows written to {self.path}")
+            self._writer.close()
+            os.replace(self.tmp_path, self.path)
+
+
+class SharedFrame:
+    """Hand a DataFrame to a worker process through shared memory instead of a pickle pipe.
+
+    The frame is written once as an Arrow IPC file under ``/dev/shm`` (a temp directory if
+    that is missing or too small), and the worker memory-maps it, so the parent never
+    pickles the data and the worker reads it without an extra copy through a pipe. The
+    parent calls ``release`` once the worker is done.
+    """
+
+    def __init__(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        root = "/dev/shm"
+        if not os.path.isdir(root) or shutil.disk_usage(root).free < 2 * table.nbytes:
+            root = tempfile.gettempdir()
+        self.path = os.path.join(root, f"census_{os.getpid()}_{uuid.uuid4().hex}.arrow")
+        with pa.OSFile(self.path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    def load(self):
+        with pa.memory_map(self.path) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def release(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,100 @@
+"""Declarative derived-metric definitions shared by the download scripts and the app."""
+
+import numpy as np
+import pandas as pd
+
+# Each metric is a dict: "name" is the output column, "num" (and optional "denom") are terms,
+# "scale" multiplies the result. A term is a column name, taken as-is (NaN stays NaN), or a
+# list of columns, summed with NaN counted as 0 like DataFrame.sum(axis=1). Metrics without a
+# "denom" are plain sums. Terms may name a metric defined earlier in the same spec.
+# Terms use raw Census variable codes so the spec holds before and after any column rename.
+ACS_METRICS = [
+    {
+        "name": "pct_bachelors_plus",
+        "num": ["B15003_022E", "B15003_023E", "B15003_024E", "B15003_025E"],
+        "denom": "B15003_001E",
+    },
+    {"name": "pct_unemployed", "num": "B23025_005E", "denom": "B23025_003E"},
+    {"name": "pct_poverty", "num": "B17001_002E", "denom": "B17001_001E"},
+    {"name": "pct_owner_occupied", "num": "B25003_002E", "denom": "B25003_001E"},
+    {"name": "pct_renter_occupied", "num": "B25003_003E", "denom": "B25003_001E"},
+    {"name": "pct_male", "num": "B01001_002E", "denom": "B01001_001E"},
+    # $200,000 or more households over all households
+    {"name": "Household Income 200+_ratio", "num": "B19001_017E", "denom": "B11012_001E"},
+    # Racial/ethnic subgroup share of total population
+    {"name": "pct_white_alone", "num": "B01001A_001E", "denom": "B01001_001E"},
+    {"name": "pct_white_nh", "num": "B01001H_001E", "denom": "B01001_001E"},
+    {"name": "pct_black", "num": "B01001B_001E", "denom": "B01001_001E"},
+    {"name": "pct_hispanic", "num": "B01001I_001E", "denom": "B01001_001E"},
+    {"name": "pct_asian", "num": "B01001D_001E", "denom": "B01001_001E"},
+    {"name": "pct_aian", "num": "B01001C_001E", "denom": "B01001_001E"},
+    {"name": "pct_nhpi", "num": "B01001E_001E", "denom": "B01001_001E"},
+    {"name": "pct_other_race", "num": "B01001F_001E", "denom": "B01001_001E"},
+    {"name": "pct_two_or_more", "num": "B01001G_001E", "denom": "B01001_001E"},
+]
+
+# Computed in the app on the renamed tables (annual rent, hence the 1/12)
+PRICE_TO_RENT = {
+    "name": "price_to_rent_ratio",
+    "num": "Median Home Value",
+    "denom": "Median Gross Rent",
+    "scale": 1 / 12,
+}
+
+
+def _resolve(term, available):
+    """Column names a term reads, or None when the term can't be evaluated on this frame."""
+    if isinstance(term, str):
+        return [term] if term in available else None
+    cols = [c for c in term if c in available]
+    return cols or None
+
+
+def compute_metrics(df, spec):
+    """Evaluate ``spec`` against ``df`` in one pass and return the metric columns as a frame.
+
+    Every input column is copied once into a float64 matrix and every metric is written into
+    one preallocated output block, instead of allocating a pandas Series per intermediate.
+    Metrics whose inputs are missing from ``df`` (e.g. tables absent from a vintage) are
+    skipped; list terms keep whichever of their columns are present. Infinite results from
+    zero denominators become NaN.
+    """
+    available = set(df.columns)
+    plan = []
+    for metric in spec:
+        terms = [metric["num"]] + ([metric["denom"]] if "denom" in metric else [])
+        resolved = [_resolve(t, available) for t in terms]
+        if any(r is None for r in resolved):
+            continue
+        plan.append((metric, [(t, r) for t, r in zip(terms, resolved)]))
+        available.add(metric["name"])
+
+    inputs = list(dict.fromkeys(
+        c for _, terms in plan for _, cols in terms for c in cols if c in df.columns
+    ))
+    matrix = df[inputs].to_numpy(dtype="float64")
+    out = np.empty((len(df), len(plan)), dtype="float64", order="F")
+    columns = {c: matrix[:, i] for i, c in enumerate(inputs)}
+
+    def _eval(term, cols):
+        if isinstance(term, str):
+            return columns[cols[0]]
+        return np.nansum(np.column_stack([columns[c] for c in cols]), axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j, (metric, terms) in enumerate(plan):
+            value = _eval(*terms[0])
+            if len(terms) > 1:
+                value = value / _eval(*terms[1])
+            out[:, j] = value * metric.get("scale", 1)
+            columns[metric["name"]] = out[:, j]
+    out[np.isinf(out)] = np.nan
+
+    return pd.DataFrame(out, index=df.index, columns=[m["name"] for m, _ in plan], copy=False)
+
+
+def add_metrics(df, spec):
+    """Compute ``spec`` and attach the metric columns to ``df`` in place."""
+    metrics = compute_metrics(df, spec)
+    if len(metrics.columns):
+        df[list(metrics.columns)] = metrics
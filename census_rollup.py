@@ -0,0 +1,118 @@
+"""Sparse rollups of Census geographies into larger areas (ZCTA -> DMA)."""
+
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class Rollup:
+    """Membership of child units in parent units as a sparse parents x children matrix.
+
+    Built once from (child, parent) pairs and reused for every column block: ``aggregate``
+    sums all count columns with a single sparse matmul instead of a groupby per table.
+    A child may belong to several parents (a ZCTA split across DMAs counts fully in each),
+    and a NaN parent is kept as its own group, like ``groupby(dropna=False)``.
+
+    Only counts can be summed. Ratios, shares and medians are not additive, so roll up the
+    numerators and denominators and derive the ratios afterwards (``census_metrics``).
+    """
+
+    def __init__(self, children, parents):
+        pairs = pd.DataFrame({"child": np.asarray(children), "parent": np.asarray(parents)})
+        pairs = pairs.drop_duplicates()
+        child_codes, self.children = pd.factorize(pairs["child"], sort=True)
+        parent_codes, self.parents = pd.factorize(
+            pairs["parent"], sort=True, use_na_sentinel=False
+        )
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(pairs)), (parent_codes, child_codes)),
+            shape=(len(self.parents), len(self.children)),
+        )
+
+    def aggregate(self, df, key, columns, parent_key=None):
+        """Sum ``columns`` of ``df`` (one row per child, identified by ``key``) into parents.
+
+        NaN counts are treated as 0, so a parent whose children are all NaN gets 0 (as with
+        ``DataFrame.sum``). Rows whose key is not a known child are ignored. Returns one row
+        per parent, sorted by parent with a NaN parent last.
+        """
+        positions = self.children.get_indexer(df[key])
+        found = positions >= 0
+        values = np.zeros((len(self.children), len(columns)), dtype="float64")
+        values[positions[found]] = np.nan_to_num(
+            df[columns].to_numpy(dtype="float64")[found], nan=0.0
+        )
+        totals = self.matrix @ values
+        return pd.concat(
+            [
+                pd.DataFrame({parent_key or key: self.parents.to_numpy()}),
+                pd.DataFrame(totals, columns=columns, copy=False),
+            ],
+            axis=1,
+        )
+
+
+_LESS_THAN = re.compile(r"^Less than \$([\d,]+)$")
+_RANGE = re.compile(r"^\$([\d,]+) to \$([\d,]+)$")
+_OR_MORE = re.compile(r"^\$([\d,]+) or more$")
+
+
+def parse_bin_bounds(label):
+    """``(lower, upper)`` dollar bounds of a distribution-table label, or None.
+
+    "Less than $10,000" -> (0, 10000), "$10,000 to $14,999" -> (10000, 15000) and
+    "$200,000 or more" -> (200000, inf); only the label's last ``!!`` segment is read.
+    """
+    text = label.rsplit("!!", 1)[-1].strip()
+
+    def _dollars(s):
+        return float(s.replace(",", ""))
+
+    if m := _LESS_THAN.match(text):
+        return 0.0, _dollars(m.group(1))
+    if m := _RANGE.match(text):
+        return _dollars(m.group(1)), _dollars(m.group(2)) + 1
+    if m := _OR_MORE.match(text):
+        return _dollars(m.group(1)), np.inf
+    return None
+
+
+def binned_median(counts, lower, upper, method="linear"):
+    """Estimate the median of every row of a bin-count matrix in one vectorized pass.
+
+    ``counts`` is rows x bins (NaN counts as 0); ``lower``/``upper`` are the bin bounds.
+    ``linear`` interpolates within the median bin, as the Census Bureau does for ACS
+    medians; ``pareto`` interpolates on a Pareto curve (better for skewed income bins) and
+    falls back to linear where it is undefined (a zero lower bound or empty bins above).
+    A median in the open-ended top bin is reported as that bin's lower bound, following
+    the Census "X or more" convention; rows without any counts are NaN.
+    """
+    counts = np.nan_to_num(np.asarray(counts, dtype="float64"), nan=0.0)
+    lower = np.asarray(lower, dtype="float64")
+    upper = np.asarray(upper, dtype="float64")
+    rows = np.arange(len(counts))
+    total = counts.sum(axis=1)
+    half = total / 2
+    cumulative = np.cumsum(counts, axis=1)
+    # First bin whose cumulative count reaches half the total
+    idx = np.minimum((cumulative < half[:, None]).sum(axis=1), counts.shape[1] - 1)
+    below = cumulative[rows, idx] - counts[rows, idx]
+    lo, hi = lower[idx], upper[idx]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = lo + (half - below) / counts[rows, idx] * (hi - lo)
+        if method == "pareto":
+            share_above_lo = (total - below) / total
+            share_above_hi = (total - cumulative[rows, idx]) / total
+            theta = np.log(share_above_lo / share_above_hi) / np.log(hi / lo)
+            pareto = lo * (share_above_lo / 0.5) ** (1 / theta)
+            # No counts above the median bin make theta infinite and the curve collapse to lo
+            defined = (lo > 0) & (share_above_hi > 0) & np.isfinite(theta) & (theta > 0)
+            estimate = np.where(defined & np.isfinite(pareto), pareto, estimate)
+        elif method != "linear":
+            raise ValueError(f"unknown method {method!r}")
+    estimate = np.where(np.isinf(hi), lo, estimate)
+    estimate[total <= 0] = np.nan
+    return estimate
@@ -0,0 +1,74 @@
+"""On-demand loading of the app's datasets, with background prefetch."""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _log(msg):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+
+class DataRegistry:
+    """Named datasets that are fetched and built the first time something asks for them.
+
+    Each dataset declares the files it reads and a zero-argument loader; ``registry[name]``
+    fetches any missing files (``fetch(filename)``, e.g. from GCS), runs the loader once and
+    caches the result. Loaders may read other datasets through the registry. Concurrent
+    requests for the same dataset wait for one load instead of repeating it, and a failed
+    load is retried on the next request.
+    """
+
+    def __init__(self, fetch=None, workers=4):
+        self._fetch = fetch
+        self._specs = {}
+        self._values = {}
+        self._locks = {}
+        self._workers = workers
+        self._executor = None
+
+    def register(self, name, loader, files=()):
+        self._specs[name] = (list(files), loader)
+        self._locks[name] = threading.Lock()
+
+    @property
+    def names(self):
+        return list(self._specs)
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        files, loader = self._specs[name]
+        with self._locks[name]:
+            if name not in self._values:
+                start = time.perf_counter()
+                if self._fetch is not None:
+                    for filename in files:
+                        self._fetch(filename)
+                self._values[name] = loader()
+                _log(f"Loaded {name} ({time.perf_counter() - start:.1f}s)")
+        return self._values[name]
+
+    def loaded(self, names):
+        return all(name in self._values for name in names)
+
+    def _load_quietly(self, name):
+        try:
+            self[name]
+        except Exception as e:  # noqa: BLE001 — a request for it will raise again
+            _log(f"Prefetch of {name} failed: {e!r}")
+
+    def prefetch(self, names):
+        """Load ``names`` in the background, in order, on a small thread pool."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix="prefetch"
+            )
+        for name in names:
+            self._executor.submit(self._load_quietly, name)
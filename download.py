@@ -1,18 +1,44 @@
-"""Download ACS 5-year census data and save to CSV."""
+"""Download ACS 5-year census data and save to Parquet."""
 
+import asyncio
+import json
+import multiprocessing as mp
 import os
 import re
 import sys
 import time
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
 
-import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
+from census_api import (
+    API_BASE,
+    CheckpointStore,
+    FetchMetrics,
+    RateController,
+    ResponseCache,
+    connection_stats,
+    connection_summary,
+    fetch,
+    make_session,
+    plan_calls,
+)
+from census_frames import (
+    SharedFrame,
+    TableWriter,
+    assemble_chunks,
+    decode_response,
+    read_table,
+    write_table,
+)
+from census_metrics import ACS_METRICS, add_metrics
+from census_rollup import Rollup, binned_median, parse_bin_bounds
+
 ACS_YEAR = 2024
-ACS_URL = f"https://api.census.gov/data/{ACS_YEAR}/acs/acs5"
+ACS_URL = f"{API_BASE}/data/{ACS_YEAR}/acs/acs5"
 
 
 def _log(msg):
@@ -27,19 +53,62 @@ load_dotenv()
 census_api_key = os.getenv("census_api_key")
 
 _OUTPUTS = [
-    f"c_state_{ACS_YEAR}.csv",
-    f"c_dma_{ACS_YEAR}.csv",
-    f"c_county_state_{ACS_YEAR}.csv",
-    f"c_zcta_dma_{ACS_YEAR}.csv",
-    f"c_tract_{ACS_YEAR}.csv",
-    f"c_block_group_{ACS_YEAR}.csv",
-    f"c_congressional_district_{ACS_YEAR}.csv",
-    f"state_name_{ACS_YEAR}.csv",
+    f"c_state_{ACS_YEAR}.parquet",
+    f"c_dma_{ACS_YEAR}.parquet",
+    f"c_county_state_{ACS_YEAR}.parquet",
+    f"c_zcta_dma_{ACS_YEAR}.parquet",
+    f"c_tract_{ACS_YEAR}.parquet",
+    f"c_block_group_{ACS_YEAR}.parquet",
+    f"c_congressional_district_{ACS_YEAR}.parquet",
+    f"state_name_{ACS_YEAR}.parquet",
 ]
-if "--force" not in sys.argv and all(os.path.exists(f) for f in _OUTPUTS):
+
+
+def _cli_list(flag):
+    """Comma-separated values of ``flag`` (``--flag a,b`` or ``--flag=a,b``), or None."""
+    for i, arg in enumerate(sys.argv):
+        if arg == flag and i + 1 < len(sys.argv):
+            return sys.argv[i + 1].split(",")
+        if arg.startswith(f"{flag}="):
+            return arg.split("=", 1)[1].split(",")
+    return None
+
+
+# Partial refresh: --levels and/or --groups fetch only those slices and merge them column-wise
+# into the saved outputs instead of redownloading everything
+LEVELS = {
+    "state": "state",
+    "county": "county",
+    "zcta": "zip code tabulation area",  # also rebuilds the DMA rollup
+    "tract": "tract",
+    "block_group": "block group",
+    "congressional_district": "congressional district",
+}
+refresh_levels = _cli_list("--levels")
+refresh_groups = _cli_list("--groups")
+PARTIAL = refresh_levels is not None or refresh_groups is not None
+if refresh_levels and set(refresh_levels) - set(LEVELS):
+    sys.exit(f"Unknown --levels {sorted(set(refresh_levels) - set(LEVELS))}: use {list(LEVELS)}")
+fetch_levels = [LEVELS[level] for level in refresh_levels or LEVELS]
+
+if PARTIAL:
+    _missing = [f for f in _OUTPUTS if not os.path.exists(f)]
+    if _missing:
+        sys.exit(f"Partial refresh needs the existing outputs; missing {_missing}")
+elif "--force" not in sys.argv and all(os.path.exists(f) for f in _OUTPUTS):
     _log(f"ACS {ACS_YEAR} data already downloaded. Run with --force to re-download.")
     sys.exit(0)
 
+# One adaptive concurrency limit and one keep-alive connection pool shared by every request
+rate = RateController(initial=4, maximum=16)
+session = make_session(pool_size=rate.maximum)
+
+# Per-request latency/bytes/status/retry counters and stage timings, written as a JSON report
+run_metrics = FetchMetrics()
+
+# Responses are cached on disk, so --force reruns only re-download with --refresh-cache
+cache = ResponseCache(refresh="--refresh-cache" in sys.argv)
+
 # Load files
 zcta_to_dma = pd.read_csv("zcta_to_dma.csv", dtype={"zcta": object})
 
@@ -47,10 +116,14 @@ zcta_to_dma = pd.read_csv("zcta_to_dma.csv", dtype={"zcta": object})
 # --- DOWNLOAD DATA ---
 # Get variable options
 _log("Fetching variable definitions from Census API...")
-response = requests.get(
-    f"https://api.census.gov/data/{ACS_YEAR}/acs/acs5/variables.json", timeout=20
-)
-variables_json = response.json()
+VARIABLES_URL = f"{ACS_URL}/variables.json"
+variables_body = cache.get(VARIABLES_URL, None)
+if variables_body is None:
+    response = session.get(VARIABLES_URL, timeout=20)
+    response.raise_for_status()
+    variables_body = response.content
+    cache.put(VARIABLES_URL, None, variables_body)
+variables_json = json.loads(variables_body)
 
 variables = pd.DataFrame.from_dict(variables_json["variables"], orient="index")
 variables = variables.reset_index(names="variable")
@@ -59,10 +132,6 @@ _log(f"  Loaded {len(variables)} variable definitions")
 # Get data for variables
 var_misc = [
     "B11012_001E",  # N Households
-    "B19001_014E",  # N Household Income 100-124
-    "B19001_015E",  # N Household Income 125-149
-    "B19001_016E",  # N Household Income 150-199
-    "B19001_017E",  # N Household Income 200+
     "B19049_003E",  # Median Household Income 25-44
     "B19013_001E",  # Median Household Income (overall)
     "B25077_001E",  # Median Home Value
@@ -84,257 +153,62 @@ groups = [
     "B23025",  # Employment Status
     "B17001",  # Poverty Status
     "B25003",  # Tenure (owner vs renter)
+    "B19001",  # Household Income (income bins)
+    "B25075",  # Value (owner-occupied home value bins)
+    "B25063",  # Gross Rent (rent bins)
     "misc",
 ]
 
+# Published medians can't be summed, so aggregated geographies (DMAs) estimate them from
+# the bin counts of these distribution tables instead
+median_bins = {
+    "B19013_001E": "B19001",  # Median Household Income from household income bins
+    "B25077_001E": "B25075",  # Median Home Value from value bins
+    "B25064_001E": "B25063",  # Median Gross Rent from cash rent bins
+}
+
 MAX_VARS_PER_CALL = 49
 
-var_groups = {}
-metrics = []
+table_vars = {}
 for g in groups:
     if g == "misc":
-        var_groups[g] = ",".join(var_misc)
-        metrics.extend(var_misc)
+        table_vars[g] = var_misc
     else:
-        vars_list = variables.loc[variables["group"] == g, "variable"].tolist()
-        metrics.extend(vars_list)
-        if len(vars_list) <= MAX_VARS_PER_CALL:
-            var_groups[g] = ",".join(vars_list)
-        else:
-            for chunk_i, start in enumerate(
-                range(0, len(vars_list), MAX_VARS_PER_CALL)
-            ):
-                chunk = vars_list[start:start + MAX_VARS_PER_CALL]
-                var_groups[f"{g}_chunk{chunk_i}"] = ",".join(chunk)
-
-_log(f"Variable groups: {len(var_groups)} groups, {len(metrics)} total metrics")
-
-def _merge_chunks(chunk_dfs, key_cols):
-    merged = chunk_dfs[0]
-    for _chunk in chunk_dfs[1:]:
-        keep = [c for c in _chunk.columns if c in key_cols or c not in merged.columns]
-        merged = merged.merge(_chunk[keep], how="outer", on=key_cols)
-    return merged
-
-
-# Make API calls for each geography level
-# Merge on FIPS identifiers (not NAME) to avoid silent mismatches if NAME strings differ
-geo_join_cols = {
-    "state": ["NAME", "state"],
-    "county": ["NAME", "state", "county"],
-    "zip code tabulation area": ["NAME", "zip code tabulation area"],
-}
-
-geo_level = ["state", "county", "zip code tabulation area"]
-dfs = {}
-for level in geo_level:
-    join_cols = geo_join_cols[level]
-    _log(f"Fetching {level} data ({len(var_groups)} API calls)...")
-    var_dfs = []
-    for i, var_str in enumerate(var_groups.values(), 1):
-        params = {"get": f"NAME,{var_str}", "for": f"{level}:*", "key": census_api_key}
-        response = requests.get(ACS_URL, params=params, timeout=20)
-
-        if response.status_code != 200:
-            _log(f"  ERROR group {i}: {response.status_code} {response.text}")
-        else:
-            data = response.json()
-            data_df = pd.DataFrame(data[1:], columns=data[0])
-            var_dfs.append(data_df)
-            _log(f"  {level}: group {i}/{len(var_groups)} done ({len(data_df)} rows)")
-
-    dfs[level] = _merge_chunks(var_dfs, join_cols)
-    _log(
-        f"  {level}: complete ({len(dfs[level])} rows, {len(dfs[level].columns)} columns)"
-    )
-
-# Parallel download helpers ########################################################################
-MAX_WORKERS = 3
-MAX_RETRIES = 3
-
-
-def _fetch_geo(for_clause, in_clause, merge_cols):
-    """Fetch all variable groups for one geography unit, with retry on failure."""
-    group_dfs = []
-    for group_var_str in var_groups.values():
-        req_params = {
-            "get": f"NAME,{group_var_str}",
-            "for": for_clause,
-            "in": in_clause,
-            "key": census_api_key,
-        }
-        for attempt in range(MAX_RETRIES):
-            try:
-                resp = requests.get(ACS_URL, params=req_params, timeout=30)
-                if resp.status_code == 200:
-                    rows = resp.json()
-                    group_dfs.append(pd.DataFrame(rows[1:], columns=rows[0]))
-                    break
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(2**attempt)
-                else:
-                    _log(f"Error {resp.status_code} after {MAX_RETRIES} attempts: {resp.text}")
-            except requests.exceptions.RequestException as e:
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(2**attempt)
-                else:
-                    _log(f"Connection error after {MAX_RETRIES} attempts: {e}")
-
-    if not group_dfs:
-        return None
-    return _merge_chunks(group_dfs, merge_cols)
-
-
-def _fetch_state_tracts(state_fips):
-    return _fetch_geo(
-        "tract:*", f"state:{state_fips}", ["NAME", "state", "county", "tract"]
+        table_vars[g] = variables.loc[variables["group"] == g, "variable"].tolist()
+metrics = [v for vars_list in table_vars.values() for v in vars_list]
+
+# Bin columns and their dollar bounds for each median estimated from a distribution table
+median_bin_bounds = {}
+for median_code, group in median_bins.items():
+    group_vars = variables[variables["group"] == group].sort_values("variable")
+    bins = [
+        (var, parse_bin_bounds(label))
+        for var, label in zip(group_vars["variable"], group_vars["label"])
+    ]
+    bins = [(var, bounds) for var, bounds in bins if bounds is not None]
+    median_bin_bounds[median_code] = (
+        [var for var, _ in bins],
+        [bounds[0] for _, bounds in bins],
+        [bounds[1] for _, bounds in bins],
     )
 
+if refresh_groups and set(refresh_groups) - set(groups):
+    sys.exit(f"Unknown --groups {sorted(set(refresh_groups) - set(groups))}: use {groups}")
+fetch_vars = {g: v for g, v in table_vars.items() if refresh_groups is None or g in refresh_groups}
+fetched_metrics = [v for vars_list in fetch_vars.values() for v in vars_list]
 
-def _fetch_county_block_groups(state_fips, county):
-    return _fetch_geo(
-        "block group:*",
-        f"state:{state_fips} county:{county}",
-        ["NAME", "state", "county", "tract", "block group"],
-    )
-
-
-def _fetch_state_congressional_districts(state_fips):
-    return _fetch_geo(
-        "congressional district:*",
-        f"state:{state_fips}",
-        ["NAME", "state", "congressional district"],
-    )
-
-
-# tract ############################################################################################
-states = dfs["state"]["state"].unique()
+# Pack every table into the fewest <=MAX_VARS_PER_CALL requests instead of one call per table
+var_groups = plan_calls(fetch_vars, MAX_VARS_PER_CALL)
+_unpacked_calls = sum(-(-len(v) // MAX_VARS_PER_CALL) for v in fetch_vars.values())
 _log(
-    f"Fetching tracts for {len(states)} states "
-    f"({len(var_groups)} groups each, {MAX_WORKERS} workers)..."
+    f"Request plan: {len(fetched_metrics)} metrics in {len(var_groups)} calls per geography unit "
+    f"(vs {_unpacked_calls} with one call per table)"
 )
-with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-    futures = {executor.submit(_fetch_state_tracts, fips): fips for fips in states}
-    tract_dfs = []
-    for i, future in enumerate(as_completed(futures), 1):
-        fips = futures[future]
-        result = future.result()
-        if result is not None:
-            tract_dfs.append(result)
-            _log(
-                f"  tracts: {i}/{len(states)} states done (state {fips}, {len(result)} tracts)"
-            )
-        else:
-            _log(f"  tracts: WARNING — state {fips} returned no data")
-
-dfs["tract"] = pd.concat(tract_dfs, ignore_index=True)
-_log(f"Tracts complete: {len(dfs['tract'])} total rows")
-
-# block group ######################################################################################
-state_counties = {
-    "36": ["005", "047", "061", "081", "085"],  # NY counties (NYC)
-    "06": ["037", "075"],  # CA counties (LA, SF)
-}
-county_pairs = [
-    (state_fips, county)
-    for state_fips, counties in state_counties.items()
-    for county in counties
-]
-_log(f"Fetching block groups for {len(county_pairs)} counties...")
-with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-    futures = {
-        executor.submit(_fetch_county_block_groups, s, c): (s, c)
-        for s, c in county_pairs
-    }
-    block_group_dfs = []
-    for i, future in enumerate(as_completed(futures), 1):
-        s, c = futures[future]
-        result = future.result()
-        if result is not None:
-            block_group_dfs.append(result)
-            _log(
-                f"  block groups: {i}/{len(county_pairs)} done "
-                f"(state {s} county {c}, {len(result)} block groups)"
-            )
-        else:
-            _log(f"  block groups: WARNING — state {s} county {c} returned no data")
-
-dfs["block group"] = pd.concat(block_group_dfs, ignore_index=True)
-_log(f"Block groups complete: {len(dfs['block group'])} total rows")
-
-# congressional district ###########################################################################
-_log(
-    f"Fetching congressional districts for {len(states)} states "
-    f"({len(var_groups)} groups each, {MAX_WORKERS} workers)..."
-)
-with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-    futures = {
-        executor.submit(_fetch_state_congressional_districts, fips): fips
-        for fips in states
-    }
-    cd_dfs = []
-    for i, future in enumerate(as_completed(futures), 1):
-        fips = futures[future]
-        result = future.result()
-        if result is not None:
-            cd_dfs.append(result)
-            _log(
-                f"  congressional districts: {i}/{len(states)} states done "
-                f"(state {fips}, {len(result)} districts)"
-            )
-        else:
-            _log(f"  congressional districts: WARNING — state {fips} returned no data")
-
-dfs["congressional district"] = pd.concat(cd_dfs, ignore_index=True)
-_log(
-    f"Congressional districts complete: {len(dfs['congressional district'])} total rows"
-)
-
-# build data frames ################################################################################
-_log("Building data frames...")
-c_state = dfs["state"].drop(columns="state").rename(columns={"NAME": "state"})
-c_county = dfs["county"]
-c_zcta = dfs["zip code tabulation area"]
-
-state_name = dfs["state"][["state", "NAME"]].rename(columns={"NAME": "state_NAME"})
-c_county_state = c_county.merge(state_name, how="left", on="state")
-c_county_state["GEOID"] = c_county_state["state"] + c_county_state["county"]
-
-c_tract = dfs["tract"]
-c_tract["GEOID"] = (
-    c_tract["state"]
-    + c_tract["county"]
-    + c_tract["tract"].str.zfill(6)
-)
-
-c_block_group = dfs["block group"]
-
-c_block_group["GEOID"] = (
-    c_block_group["state"]
-    + c_block_group["county"]
-    + c_block_group["tract"].str.zfill(6)
-    + c_block_group["block group"]
-)
-
-c_congressional_district = dfs["congressional district"]
-c_congressional_district["GEOID"] = (
-    c_congressional_district["state"]
-    + c_congressional_district["congressional district"].str.zfill(2)
-)
-c_congressional_district = c_congressional_district.merge(
-    state_name, how="left", on="state"
-)
-
-# --- CLEAN UP ---
-_log("Cleaning up and computing derived metrics...")
-c_zcta = c_zcta.rename(columns={"zip code tabulation area": "zcta"})
-
-c_zcta_dma = c_zcta.merge(zcta_to_dma, how="left", on="zcta")
-c_zcta_dma[metrics] = c_zcta_dma[metrics].astype(float)
-
-c_dma = c_zcta_dma.groupby("dma", as_index=False, dropna=False).sum(numeric_only=True)
+if PARTIAL:
+    _log(f"Partial refresh of levels {refresh_levels or list(LEVELS)}, groups {list(fetch_vars)}")
 
 
+# Column labels and derived metrics ###############################################################
 def _clean_census_label(concept, label):
     """Convert a Census API concept + label into a short readable column name.
 
@@ -408,6 +282,16 @@ def _clean_census_label(concept, label):
         detail = _scrub(re.sub(r"^Estimate!!Total:!*", "", label))
         return " ".join(filter(None, ["Housing Tenure", detail]))
 
+    # Home value counts (B25075)
+    if re.fullmatch(r"Value", concept.strip(), re.IGNORECASE):
+        breakdown = _scrub(re.sub(r"^Estimate!!Total:!*", "", label))
+        return " ".join(filter(None, ["N Home Value", breakdown]))
+
+    # Gross rent counts (B25063)
+    if re.fullmatch(r"Gross Rent", concept.strip(), re.IGNORECASE):
+        breakdown = _scrub(re.sub(r"^Estimate!!Total:!*", "", label))
+        return " ".join(filter(None, ["N Gross Rent", breakdown]))
+
     # Median Home Value (B25077)
     if re.search(r"Median Value", concept, re.IGNORECASE):
         return "Median Home Value"
@@ -443,108 +327,445 @@ decade_aggregations = [
     ("80 years and over", ["80 to 84 years", "85 years and over"]),
 ]
 
-decade_labels = [d[0] for d in decade_aggregations]
-
-# Racial/ethnic subgroup share of total population
-racial_pct = {
-    "pct_white_alone": "Pop White Alone",
-    "pct_white_nh": "Pop White Alone Not Hispanic or Latino",
-    "pct_black": "Pop Black or African American Alone",
-    "pct_hispanic": "Pop Hispanic or Latino",
-    "pct_asian": "Pop Asian Alone",
-    "pct_aian": "Pop American Indian and Alaska Native Alone",
-    "pct_nhpi": "Pop Native Hawaiian and Other Pacific Islander Alone",
-    "pct_other_race": "Pop Some Other Race Alone",
-    "pct_two_or_more": "Pop Two or More Races",
+# Decade sums read the single-year Sex by Age columns by code (labels map back to codes), so the
+# whole spec is evaluated in one pass before the rename
+_code_for_label = {concept_label_map.get(code, code): code for code in metrics}
+decade_metrics = [
+    {
+        "name": f"Pop {gender} {decade}",
+        "num": [_code_for_label.get(f"Pop {gender} {c}", "") for c in cols],
+    }
+    for gender in ["Male", "Female"]
+    for decade, cols in decade_aggregations
+] + [
+    {
+        "name": f"pct_male_{decade}",
+        "num": f"Pop Male {decade}",
+        "denom": [f"Pop Male {decade}", f"Pop Female {decade}"],
+    }
+    for decade, _ in decade_aggregations
+]
+derived_metrics = ACS_METRICS + decade_metrics
+
+
+def _add_derived_metrics(_df):
+    """Add pct_/ratio/decade columns and rename raw Census codes, in place."""
+    add_metrics(_df, derived_metrics)
+    _df.rename(columns=concept_label_map, inplace=True)
+
+
+def _stale_metrics(changed):
+    """Derived metrics that read any ``changed`` column, directly or through another metric."""
+    stale = set(changed)
+    out = []
+    for metric in derived_metrics:
+        terms = [metric["num"]] + ([metric["denom"]] if "denom" in metric else [])
+        names = {c for t in terms for c in ([t] if isinstance(t, str) else t)}
+        if names & stale:
+            out.append(metric)
+            stale.add(metric["name"])
+    return out
+
+
+def _merge_refresh(fresh, path, key):
+    """Merge a partial refresh (raw Census codes) into the table saved at ``path``.
+
+    Refetched columns overwrite the saved ones row-by-row on ``key`` (new tables are
+    appended), and only the derived metrics whose inputs were refetched are recomputed.
+    Rows missing from the refresh keep their saved values, but their refetched columns
+    become NaN.
+    """
+    saved = read_table(path)
+    saved = saved.rename(columns=_code_for_label)
+    columns = list(saved.columns)
+    saved = saved.set_index(key)
+    # Refetched codes plus any medians re-estimated from refetched bins
+    changed = [c for c in fresh.columns if c in fetched_metrics or c in median_bins]
+    saved[changed] = fresh.set_index(key)[changed].reindex(saved.index)
+    stale = _stale_metrics(changed)
+    add_metrics(saved, stale)
+    added = [c for c in changed + [m["name"] for m in stale] if c not in columns]
+    merged = saved.reset_index()[columns + added]
+    return merged.rename(columns=concept_label_map)
+
+
+# Async download engine ############################################################################
+# Every (level, geo unit, var group) request is scheduled on one event loop and shares a single
+# adaptive concurrency limit, so the phases overlap instead of running one after another.
+# Merge on FIPS identifiers (not NAME) to avoid silent mismatches if NAME strings differ
+geo_join_cols = {
+    "state": ["NAME", "state"],
+    "county": ["NAME", "state", "county"],
+    "zip code tabulation area": ["NAME", "zip code tabulation area"],
+    "tract": ["NAME", "state", "county", "tract"],
+    "block group": ["NAME", "state", "county", "tract", "block group"],
+    "congressional district": ["NAME", "state", "congressional district"],
 }
 
-# Derived metrics computed using raw Census codes BEFORE column rename
-pre_rename_derived = {
-    "pct_bachelors_plus": {
-        "num": ["B15003_022E", "B15003_023E", "B15003_024E", "B15003_025E"],
-        "denom": "B15003_001E",
-    },
-    "pct_unemployed": {
-        "num": ["B23025_005E"],
-        "denom": "B23025_003E",
-    },
-    "pct_poverty": {
-        "num": ["B17001_002E"],
-        "denom": "B17001_001E",
-    },
-    "pct_owner_occupied": {
-        "num": ["B25003_002E"],
-        "denom": "B25003_001E",
-    },
-    "pct_renter_occupied": {
-        "num": ["B25003_003E"],
-        "denom": "B25003_001E",
-    },
+MAX_RETRIES = 3
+
+state_counties = {
+    "36": ["005", "047", "061", "081", "085"],  # NY counties (NYC)
+    "06": ["037", "075"],  # CA counties (LA, SF)
 }
 
-_dfs_to_process = [
-    ("state", c_state),
-    ("dma", c_dma),
-    ("county", c_county_state),
-    ("zcta", c_zcta_dma),
-    ("tract", c_tract),
-    ("block_group", c_block_group),
-    ("congressional_district", c_congressional_district),
-]
-for name, _df in _dfs_to_process:
-    _log(f"  Computing derived metrics for {name} ({len(_df)} rows)...")
-    # Replace Census suppressed-value sentinel before any derived calculations
-    available_metrics = [m for m in metrics if m in _df.columns]
-    _df[available_metrics] = (
-        _df[available_metrics].astype(float).replace(-666666666.0, np.nan)
+# Nationwide block groups (~240k rows) are streamed to one Parquet file per state instead of being
+# held in memory; the state_counties subset is still kept for the regular c_block_group table
+NATIONWIDE_BLOCK_GROUPS = "--nationwide-block-groups" in sys.argv
+BLOCK_GROUP_DIR = f"c_block_group_{ACS_YEAR}"
+if PARTIAL and NATIONWIDE_BLOCK_GROUPS and "block group" in fetch_levels:
+    if not os.path.isdir(BLOCK_GROUP_DIR):
+        sys.exit(f"Partial refresh needs the existing {BLOCK_GROUP_DIR}/ partitions")
+
+# Tract and congressional-district units are per state; without the state level in this run
+# the FIPS list comes from the saved state_name table
+if "state" not in fetch_levels:
+    state_name = read_table(f"state_name_{ACS_YEAR}.parquet")
+
+
+# Completed (level, geo unit, var group) responses are checkpointed so a crashed run resumes
+checkpoints = CheckpointStore(
+    f".checkpoints/acs_{ACS_YEAR}",
+    fingerprint=json.dumps([ACS_YEAR, var_groups, fetch_levels, state_counties], sort_keys=True),
+)
+if checkpoints.done:
+    _log(f"Resuming from checkpoint: {len(checkpoints.done)} work units already complete")
+
+
+def _decode(body, key_cols):
+    with run_metrics.stage("decode"):
+        return decode_response(body, key_cols)
+
+
+async def _fetch_var_group(level, in_clause, group, var_str):
+    """Fetch one variable group for one geography unit, with retry on failure."""
+    for_clause = f"{level}:*"
+    key_cols = geo_join_cols[level]
+    unit = CheckpointStore.unit_id(for_clause, in_clause or "*", group)
+    body = checkpoints.get(unit)
+    if body is not None:
+        return _decode(body, key_cols)
+
+    req_params = {"get": f"NAME,{var_str}", "for": for_clause, "key": census_api_key}
+    if in_clause:
+        req_params["in"] = in_clause
+    body = cache.get(ACS_URL, req_params)
+    if body is not None:
+        checkpoints.put(unit, body)
+        return _decode(body, key_cols)
+    try:
+        resp = await asyncio.to_thread(
+            fetch,
+            ACS_URL,
+            req_params,
+            rate,
+            session,
+            timeout=30,
+            max_retries=MAX_RETRIES,
+            metrics=run_metrics,
+        )
+    except requests.exceptions.RequestException as e:
+        _log(f"Connection error after {MAX_RETRIES} attempts: {e}")
+        return None
+    if resp.status_code != 200:
+        _log(f"Error {resp.status_code} after {MAX_RETRIES} attempts: {resp.text}")
+        return None
+    cache.put(ACS_URL, req_params, resp.content)
+    checkpoints.put(unit, resp.content)
+    return _decode(resp.content, key_cols)
+
+
+async def _fetch_unit(level, in_clause):
+    """Fetch all variable groups for one geography unit and merge them on FIPS keys."""
+    group_dfs = await asyncio.gather(
+        *(
+            _fetch_var_group(level, in_clause, group, var_str)
+            for group, var_str in var_groups.items()
+        )
     )
-    # Compute pct_ derived metrics using raw Census codes before rename
-    for pct_col, spec in pre_rename_derived.items():
-        num_cols = [c for c in spec["num"] if c in _df.columns]
-        denom_col = spec["denom"]
-        if num_cols and denom_col in _df.columns:
-            _df[pct_col] = _df[num_cols].sum(axis=1) / _df[denom_col]
-    _df.rename(columns=concept_label_map, inplace=True)
+    group_dfs = [df for df in group_dfs if df is not None]
+    if not group_dfs:
+        return in_clause, None
+    with run_metrics.stage("assemble"):
+        return in_clause, assemble_chunks(group_dfs, geo_join_cols[level])
+
+
+def _process_unit(df, prepare, writer):
+    """Prepare one unit's frame, add derived metrics and append it to ``writer``."""
+    df = prepare(df)
+    with run_metrics.stage("derive"):
+        _add_derived_metrics(df)
+    with run_metrics.stage("save"):
+        writer.write(df)
 
-    _df["pct_male"] = _df["Pop Male"] / _df["Pop"]
-    _df["Household Income 200+_ratio"] = (
-        _df["N Household Income 200000 or more"]
-        / _df["Households by Type - Estimate Total"]
+
+async def _fetch_level(level, in_clauses, writer=None, prepare=None):
+    """Fetch every unit of one geography level and concatenate the results.
+
+    With a ``writer``, each unit is instead passed through ``prepare`` (GEOIDs, joins), given
+    derived metrics and appended to the writer's file on a worker thread as soon as it
+    arrives, so the transform overlaps the remaining downloads and the level is never held
+    in memory whole. Returns None in that case.
+    """
+    _log(
+        f"Fetching {level} data ({len(in_clauses)} units x {len(var_groups)} calls "
+        f"= {len(in_clauses) * len(var_groups)} requests)..."
     )
-    for gender in ["Male", "Female"]:
-        for decade, cols in decade_aggregations:
-            colnames = [f"Pop {gender} {c}" for c in cols]
-            new_col = f"Pop {gender} {decade}"
-            _df[new_col] = _df[colnames].sum(axis=1)
-    for decade in decade_labels:
-        male_col = f"Pop Male {decade}"
-        female_col = f"Pop Female {decade}"
-        ratio_col = f"pct_male_{decade}"
-        _df[ratio_col] = _df[male_col] / (_df[male_col] + _df[female_col])
-    for pct_col, source_col in racial_pct.items():
-        if source_col in _df.columns:
-            _df[pct_col] = _df[source_col] / _df["Pop"]
-
-    _df.replace([np.inf, -np.inf], np.nan, inplace=True)
-
-# Drop all Median columns from c_dma — summing medians over ZCTAs is meaningless
-median_cols_to_drop = [c for c in c_dma.columns if "Median" in c]
-c_dma = c_dma.drop(columns=median_cols_to_drop)
-
-# --- SAVE ---
-_log("Saving CSVs...")
-state_name.to_csv(f"state_name_{ACS_YEAR}.csv", index=False)
-
-for filename, _df in [
-    (f"c_state_{ACS_YEAR}.csv", c_state),
-    (f"c_dma_{ACS_YEAR}.csv", c_dma),
-    (f"c_county_state_{ACS_YEAR}.csv", c_county_state),
-    (f"c_zcta_dma_{ACS_YEAR}.csv", c_zcta_dma),
-    (f"c_tract_{ACS_YEAR}.csv", c_tract),
-    (f"c_block_group_{ACS_YEAR}.csv", c_block_group),
-    (f"c_congressional_district_{ACS_YEAR}.csv", c_congressional_district),
-]:
-    _df.to_csv(filename, index=False)
-    _log(f"  Saved {filename} ({len(_df)} rows, {len(_df.columns)} columns)")
+    level_dfs = []
+    processing = []
+    units = [_fetch_unit(level, in_clause) for in_clause in in_clauses]
+    for i, unit in enumerate(asyncio.as_completed(units), 1):
+        in_clause, result = await unit
+        where = in_clause or "all"
+        if result is None:
+            _log(f"  {level}: WARNING — {where} returned no data")
+            continue
+        _log(f"  {level}: {i}/{len(units)} units done ({where}, {len(result)} rows)")
+        if writer is None:
+            level_dfs.append(result)
+        else:
+            processing.append(asyncio.to_thread(_process_unit, result, prepare, writer))
+
+    if writer is not None:
+        await asyncio.gather(*processing)
+        writer.close()
+        _log(f"  {level}: complete, saved {writer.path} ({writer.rows} rows)")
+        return None
+    level_df = pd.concat(level_dfs, ignore_index=True)
+    _log(f"  {level}: complete ({len(level_df)} rows, {len(level_df.columns)} columns)")
+    return level_df
+
 
+def _state_name(state_df):
+    return state_df[["state", "NAME"]].rename(columns={"NAME": "state_NAME"})
+
+
+def _with_tract_geoid(df):
+    df["GEOID"] = df["state"] + df["county"] + df["tract"].str.zfill(6)
+    return df
+
+
+def _with_congressional_district_geoid(df, state_name):
+    df["GEOID"] = df["state"] + df["congressional district"].str.zfill(2)
+    return df.merge(state_name, how="left", on="state")
+
+
+def _block_group_geoid(df):
+    return df["state"] + df["county"] + df["tract"].str.zfill(6) + df["block group"]
+
+
+async def _stream_block_groups(state_fips):
+    """Fetch block groups per state and write each state's partition as it arrives.
+
+    States run concurrently, their var-group requests all under the shared rate controller,
+    but only as many states are in flight as it takes to fill the controller's ceiling, so
+    peak memory is bounded by a few states rather than the nation. Derived metrics are
+    computed per partition. Returns the state_counties rows (before derived metrics) for
+    the regular c_block_group table.
+    """
+    os.makedirs(BLOCK_GROUP_DIR, exist_ok=True)
+    in_flight = max(2, -(-rate.maximum // len(var_groups)))
+    _log(
+        f"Streaming block groups for {len(state_fips)} states to {BLOCK_GROUP_DIR}/ "
+        f"({in_flight} states at a time)..."
+    )
+    slots = asyncio.Semaphore(in_flight)
+    done = 0
+
+    async def _stream_state(fips):
+        nonlocal done
+        async with slots:
+            _, bg = await _fetch_unit("block group", f"state:{fips} county:*")
+            if bg is None:
+                _log(f"  block group partitions: WARNING — state {fips} returned no data")
+                return None
+            bg["GEOID"] = _block_group_geoid(bg)
+            city_rows = bg[bg["county"].isin(state_counties.get(fips, []))].copy()
+            path = os.path.join(BLOCK_GROUP_DIR, f"{fips}.parquet")
+            if PARTIAL:
+                bg = await asyncio.to_thread(_merge_refresh, bg, path, "GEOID")
+            else:
+                await asyncio.to_thread(_add_derived_metrics, bg)
+            await asyncio.to_thread(write_table, bg, path)
+            done += 1
+            _log(
+                f"  block group partitions: {done}/{len(state_fips)} states "
+                f"({path}, {len(bg)} rows)"
+            )
+            return city_rows
+
+    city_dfs = await asyncio.gather(*(_stream_state(fips) for fips in state_fips))
+    return pd.concat([df for df in city_dfs if df is not None], ignore_index=True)
+
+
+async def _download_all():
+    """Schedule every geography level under the shared rate controller.
+
+    Tract and congressional-district units are expanded per state as soon as the state level
+    is in; everything else starts immediately.
+    """
+    # Enough threads for the controller's ceiling; it decides how many are actually in flight
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=rate.maximum)
+    )
+    county_clauses = [
+        f"state:{state_fips} county:{county}"
+        for state_fips, counties in state_counties.items()
+        for county in counties
+    ]
+    national_levels = [("state", [None]), ("county", [None]), ("zip code tabulation area", [None])]
+    if not NATIONWIDE_BLOCK_GROUPS:
+        national_levels.append(("block group", county_clauses))
+    tasks = {
+        level: asyncio.create_task(_fetch_level(level, in_clauses))
+        for level, in_clauses in national_levels
+        if level in fetch_levels
+    }
+
+    names = _state_name(await tasks["state"]) if "state" in tasks else state_name
+    state_fips = names["state"].unique()
+    state_clauses = [f"state:{fips}" for fips in state_fips]
+    # Per-state levels are transformed and written as each state arrives; a partial refresh
+    # collects them instead so they can be merged into the saved tables
+    for level, name, prepare in [
+        ("tract", "tract", _with_tract_geoid),
+        (
+            "congressional district",
+            "congressional_district",
+            partial(_with_congressional_district_geoid, state_name=names),
+        ),
+    ]:
+        if level in fetch_levels:
+            writer = None if PARTIAL else TableWriter(f"c_{name}_{ACS_YEAR}.parquet")
+            tasks[level] = asyncio.create_task(
+                _fetch_level(level, state_clauses, writer, prepare)
+            )
+    if NATIONWIDE_BLOCK_GROUPS and "block group" in fetch_levels:
+        tasks["block group"] = asyncio.create_task(_stream_block_groups(state_fips))
+
+    return {level: await task for level, task in tasks.items()}
+
+
+dfs = asyncio.run(_download_all())
+_log(
+    f"Download complete ({cache.summary()}, {rate.summary()}, {connection_summary(session)}, "
+    f"{run_metrics.summary()}, evicted {cache.evict()} stale entries)"
+)
+
+
+# build data frames ################################################################################
+_log("Building data frames...")
+tables = {}
+if "state" in dfs:
+    state_name = _state_name(dfs["state"])
+    tables["state"] = dfs["state"].drop(columns="state").rename(columns={"NAME": "state"})
+
+if "zip code tabulation area" in dfs:
+    c_zcta = dfs["zip code tabulation area"].rename(columns={"zip code tabulation area": "zcta"})
+    c_zcta_dma = c_zcta.merge(zcta_to_dma, how="left", on="zcta")
+    # Roll up counts only (medians aren't additive); DMA ratios are derived from the summed counts
+    dma_rollup = Rollup(c_zcta_dma["zcta"], c_zcta_dma["dma"])
+    count_cols = [
+        c for c in c_zcta.columns
+        if c in metrics and "Median" not in concept_label_map.get(c, c)
+    ]
+    c_dma = dma_rollup.aggregate(c_zcta, "zcta", count_cols, parent_key="dma")
+    # Medians from the summed bin counts, all DMAs in one pass per table
+    for median_code, (bin_cols, lower, upper) in median_bin_bounds.items():
+        if bin_cols and all(c in c_dma.columns for c in bin_cols):
+            c_dma[median_code] = binned_median(c_dma[bin_cols], lower, upper)
+    tables["dma"] = c_dma
+
+if "county" in dfs:
+    c_county_state = dfs["county"].merge(state_name, how="left", on="state")
+    c_county_state["GEOID"] = c_county_state["state"] + c_county_state["county"]
+    tables["county_state"] = c_county_state
+
+if "zip code tabulation area" in dfs:
+    tables["zcta_dma"] = c_zcta_dma
+
+# Tract and congressional-district outputs are already saved unless this is a partial refresh
+if dfs.get("tract") is not None:
+    tables["tract"] = _with_tract_geoid(dfs["tract"])
+
+if "block group" in dfs:
+    c_block_group = dfs["block group"]
+    c_block_group["GEOID"] = _block_group_geoid(c_block_group)
+    tables["block_group"] = c_block_group
+
+if dfs.get("congressional district") is not None:
+    tables["congressional_district"] = _with_congressional_district_geoid(
+        dfs["congressional district"], state_name
+    )
+
+# --- CLEAN UP ---
+# Column that identifies a row in each output, used to merge a partial refresh
+table_keys = {
+    "state": "state",
+    "dma": "dma",
+    "county_state": "GEOID",
+    "zcta_dma": "zcta",
+    "tract": "GEOID",
+    "block_group": "GEOID",
+    "congressional_district": "GEOID",
+}
+
+
+def _finish_table(name, handoff):
+    """Derive metrics for (or merge a partial refresh into) one output table and save it.
+
+    Runs in a transform worker process; ``handoff`` is a ``SharedFrame``, or the frame
+    itself when the stage runs inline. A worker's copy of ``run_metrics`` is lost when it
+    exits, so the stage timings are returned with the result for the parent to add.
+    """
+    _df = handoff.load() if isinstance(handoff, SharedFrame) else handoff
+    path = f"c_{name}_{ACS_YEAR}.parquet"
+    stage_metrics = FetchMetrics()
+    with stage_metrics.stage("derive"):
+        if PARTIAL:
+            _df = _merge_refresh(_df, path, table_keys[name])
+        else:
+            _add_derived_metrics(_df)
+    with stage_metrics.stage("save"):
+        write_table(_df, path)
+    return path, len(_df), len(_df.columns), stage_metrics.stages
+
+
+# One table per worker process. Workers are forked so they inherit this script's state
+# (metric spec, label map) without re-running it; frames are handed over in shared memory.
+_workers = _cli_list("--transform-workers")
+TRANSFORM_WORKERS = max(1, min(len(tables), int(_workers[0]) if _workers else os.cpu_count() or 1))
+if TRANSFORM_WORKERS > 1 and "fork" not in mp.get_all_start_methods():
+    TRANSFORM_WORKERS = 1
+
+verb = "Merging refreshed columns into" if PARTIAL else "Computing derived metrics for"
+_log(f"{verb} {len(tables)} tables ({TRANSFORM_WORKERS} worker processes)...")
+if "state" in dfs:
+    write_table(state_name, f"state_name_{ACS_YEAR}.parquet")
+
+with run_metrics.stage("transform"):
+    if TRANSFORM_WORKERS > 1:
+        handoffs = {name: SharedFrame(_df) for name, _df in tables.items()}
+        tables.clear()
+        try:
+            with ProcessPoolExecutor(TRANSFORM_WORKERS, mp_context=mp.get_context("fork")) as pool:
+                futures = [pool.submit(_finish_table, name, h) for name, h in handoffs.items()]
+                saved = [future.result() for future in as_completed(futures)]
+        finally:
+            for handoff in handoffs.values():
+                handoff.release()
+    else:
+        saved = [_finish_table(name, tables.pop(name)) for name in list(tables)]
+for filename, rows, cols, stages in saved:
+    run_metrics.add_stages(stages)
+    _log(f"  Saved {filename} ({rows} rows, {cols} columns)")
+
+checkpoints.clear()
+_report = run_metrics.write(
+    f"download_{ACS_YEAR}",
+    cache=cache.stats(),
+    rate=rate.stats(),
+    connections=connection_stats(session),
+)
+_log(f"Run metrics written to {_report}")
 _log(f"Done! Total time: {time.time() - _start:.0f}s")
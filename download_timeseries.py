@@ -1,15 +1,32 @@
-"""Download ACS 5-year time series (2009-2024) at state and county level."""
+"""Download ACS 5-year time series (2009-2024) at state, county, ZCTA and tract level.
+
+State and county go to one Parquet file each; ZCTA and tract are written one year at a
+time to c_timeseries_{level}/{year}.parquet so memory stays flat.
+"""
 
 import os
 import sys
 import time
 import requests
-import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-ACS_BASE = "https://api.census.gov/data/{year}/acs/acs5"
+from census_api import (
+    API_BASE,
+    FetchMetrics,
+    RateController,
+    ResponseCache,
+    connection_stats,
+    connection_summary,
+    fetch,
+    make_session,
+)
+from census_frames import decode_response, read_table, write_table
+from census_cube import TimeseriesCube
+from census_metrics import ACS_METRICS, PRICE_TO_RENT, add_metrics, compute_metrics
+
+ACS_BASE = API_BASE + "/data/{year}/acs/acs5"
 YEARS = list(range(2009, 2025))
 
 
@@ -17,17 +34,47 @@ def _log(msg):
     print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
 
 
+def _cli_list(flag):
+    """Comma-separated values of ``--flag a,b`` / ``--flag=a,b``, or None when absent."""
+    for i, arg in enumerate(sys.argv):
+        if arg == flag and i + 1 < len(sys.argv):
+            return sys.argv[i + 1].split(",")
+        if arg.startswith(flag + "="):
+            return arg.split("=", 1)[1].split(",")
+    return None
+
+
+# CLI name -> output path; the partitioned levels are directories of one file per year
+LEVEL_OUTPUTS = {
+    "state": "c_timeseries_state.parquet",
+    "county": "c_timeseries_county.parquet",
+    "zcta": "c_timeseries_zcta",
+    "tract": "c_timeseries_tract",
+}
+levels = _cli_list("--levels") or list(LEVEL_OUTPUTS)
+if unknown := set(levels) - set(LEVEL_OUTPUTS):
+    sys.exit(f"Unknown --levels {sorted(unknown)}; choose from {list(LEVEL_OUTPUTS)}")
+
 _start = time.time()
-_log(f"Starting timeseries download ({len(YEARS)} years, state + county)")
+_log(f"Starting timeseries download ({len(YEARS)} years, {' + '.join(levels)})")
 
 load_dotenv()
 census_api_key = os.getenv("census_api_key")
 
-_OUTPUTS = ["c_timeseries_state.csv", "c_timeseries_county.csv"]
-if "--force" not in sys.argv and all(os.path.exists(f) for f in _OUTPUTS):
-    _log("Timeseries data already downloaded. Run with --force to re-download.")
+# --append keeps the saved outputs and only fetches the years they don't have yet
+APPEND = "--append" in sys.argv
+
+_OUTPUTS = [LEVEL_OUTPUTS[level] for level in levels]
+if "--force" not in sys.argv and not APPEND and all(os.path.exists(f) for f in _OUTPUTS):
+    _log(
+        "Timeseries data already downloaded. Run with --append to add new years "
+        "or --force to re-download."
+    )
     sys.exit(0)
 
+# Responses are cached on disk, so --force reruns only re-download with --refresh-cache
+cache = ResponseCache(refresh="--refresh-cache" in sys.argv)
+
 # Focused summary variables — all fit in one API call per year per geo level
 VARS = [
     "B01001_001E",  # Total population
@@ -54,6 +101,7 @@ VARS = [
 ]
 
 VAR_STR = ",".join(VARS)
+KEY_COLS = {"NAME", "state", "county", "tract", "zip code tabulation area"}
 
 # Prefix intermediates with _ so they're easy to drop after deriving pct_ cols
 RENAME = {
@@ -80,8 +128,18 @@ RENAME = {
     "B25003_003E": "_tenure_renter",
 }
 
+# Every value column a full (2012+) year yields; partitions are reindexed to it so each
+# year's file has the same schema and the directory reads back as one table
+VALUE_COLUMNS = [RENAME[v] for v in VARS if not RENAME[v].startswith("_")] + list(
+    compute_metrics(pd.DataFrame(columns=VARS, dtype="float64"), ACS_METRICS).columns
+) + [PRICE_TO_RENT["name"]]
+
 MAX_RETRIES = 3
-MAX_WORKERS = 6
+
+# Adaptive concurrency and one keep-alive connection pool shared by every year request
+rate = RateController(initial=4, maximum=12)
+session = make_session(pool_size=rate.maximum)
+run_metrics = FetchMetrics()
 
 # B23025 (Employment Status) and B15003 (Educational Attainment) introduced in 2012
 VARS_PRE2012 = [
@@ -90,10 +148,10 @@ VARS_PRE2012 = [
 VAR_STR_PRE2012 = ",".join(VARS_PRE2012)
 
 
-def _fetch_all_years(for_clause, label):
-    _log(f"Fetching {label} timeseries ({len(YEARS)} years, {MAX_WORKERS} workers)...")
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(_fetch_year, y, for_clause): y for y in YEARS}
+def _fetch_all_years(for_clause, label, years=YEARS):
+    _log(f"Fetching {label} timeseries ({len(years)} years, up to {rate.maximum} workers)...")
+    with ThreadPoolExecutor(max_workers=rate.maximum) as executor:
+        futures = {executor.submit(_fetch_year, y, for_clause): y for y in years}
         dfs = []
         for future in as_completed(futures):
             y = futures[future]
@@ -101,90 +159,217 @@ def _fetch_all_years(for_clause, label):
             if result is not None:
                 dfs.append(result)
                 _log(f"  {label} {y}: {len(result)} rows")
-    return pd.concat(dfs, ignore_index=True)
+    return pd.concat(dfs, ignore_index=True) if dfs else None
 
 
-def _fetch_year(year, for_clause):
+def _fetch_year(year, for_clause, in_clause=None):
     url = ACS_BASE.format(year=year)
     var_str = VAR_STR if year >= 2012 else VAR_STR_PRE2012
     params = {"get": f"NAME,{var_str}", "for": for_clause, "key": census_api_key}
-    for attempt in range(MAX_RETRIES):
-        try:
-            r = requests.get(url, params=params, timeout=30)
-            if r.status_code == 200:
-                data = r.json()
-                df = pd.DataFrame(data[1:], columns=data[0])
-                df["year"] = year
-                return df
-            if r.status_code == 404:
-                _log(f"  {year} 404 — skipping (variables not available this year)")
-                return None
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(2**attempt)
-            else:
-                _log(f"  {year} ERROR {r.status_code}: {r.text[:120]}")
-        except requests.RequestException as e:
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(2**attempt)
-            else:
-                _log(f"  {year} EXCEPTION: {e}")
-    return None
+    if in_clause:
+        params["in"] = in_clause
+    body = cache.get(url, params)
+    if body is not None:
+        with run_metrics.stage("decode"):
+            df = decode_response(body, KEY_COLS)
+        df["year"] = year
+        return df
+    try:
+        r = fetch(
+            url, params, rate, session, timeout=30, max_retries=MAX_RETRIES, metrics=run_metrics
+        )
+    except requests.RequestException as e:
+        _log(f"  {year} EXCEPTION: {e}")
+        return None
+    if r.status_code == 404:
+        _log(f"  {year} 404 — skipping (variables not available this year)")
+        return None
+    if r.status_code != 200:
+        _log(f"  {year} ERROR {r.status_code}: {r.text[:120]}")
+        return None
+    cache.put(url, params, r.content)
+    with run_metrics.stage("decode"):
+        df = decode_response(r.content, KEY_COLS)
+    df["year"] = year
+    return df
 
 
 def _process(df):
-    """Cast to float, clean sentinel, derive pct_ metrics, drop intermediates."""
-    for col in VARS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").replace(
-                -666666666.0, np.nan
-            )
+    """Derive pct_ metrics and drop intermediates (values arrive as float, sentinels as NaN)."""
+    with run_metrics.stage("derive"):
+        add_metrics(df, ACS_METRICS)
     df = df.rename(columns=RENAME)
-    df["pct_male"] = df["_pop_male"] / df["Pop"]
-    df["pct_white_nh"] = df["_pop_white_nh"] / df["Pop"]
-    df["pct_black"] = df["_pop_black"] / df["Pop"]
-    df["pct_hispanic"] = df["_pop_hispanic"] / df["Pop"]
-    df["pct_asian"] = df["_pop_asian"] / df["Pop"]
-    df["pct_poverty"] = df["_poverty_below"] / df["_poverty_total"]
-    df["pct_unemployed"] = df["_unemployed"] / df["_labor_force"]
-    df["pct_bachelors_plus"] = (
-        df[
-            [
-                "_educ_bachelors",
-                "_educ_masters",
-                "_educ_professional",
-                "_educ_doctorate",
-            ]
-        ].sum(axis=1)
-        / df["_educ_total"]
+    df = df.drop(columns=[c for c in df.columns if c.startswith("_")])
+    # Price-to-rent reads the renamed medians; stored so the timeseries cubes carry it
+    add_metrics(df, [PRICE_TO_RENT])
+    return df
+
+
+def _finish_state(df):
+    return df.drop(columns=["state"], errors="ignore").rename(columns={"NAME": "state"})
+
+
+def _finish_county(df):
+    df["GEOID"] = df["state"] + df["county"]
+    return df.drop(columns=["state", "county"], errors="ignore")
+
+
+def _update(path, for_clause, label, finish, sort_cols):
+    """Fetch and process the years ``path`` is missing (every year unless --append).
+
+    With --append the new rows are appended to the saved ones. Returns the frame to
+    save, or None if there's nothing new (already up to date, or no year released yet).
+    """
+    saved = None
+    if APPEND and os.path.exists(path):
+        saved = read_table(path)
+    have = set() if saved is None else set(saved["year"])
+    years = [y for y in YEARS if y not in have]
+    if not years:
+        _log(f"{label} timeseries already has {YEARS[0]}-{YEARS[-1]}; nothing to fetch")
+        return None
+    fetched = _fetch_all_years(for_clause, label, years)
+    if fetched is None:
+        _log(f"{label} timeseries: none of {years} is available yet")
+        return None
+    df = finish(_process(fetched))
+    if saved is not None:
+        _log(f"Appending {label} years {sorted(df['year'].unique())} to {path}")
+        df = pd.concat([saved, df], ignore_index=True)
+    df = df.sort_values(sort_cols).reset_index(drop=True)
+    _log(f"{label} timeseries complete: {len(df)} rows, {len(df.columns)} columns")
+    return df
+
+
+def _finish_zcta(df):
+    df = df.rename(columns={"zip code tabulation area": "zcta"})
+    # 2011-2018 responses also carry the state the ZCTA is nested in
+    return df.drop(columns=["state"], errors="ignore")
+
+
+def _finish_tract(df):
+    df["GEOID"] = df["state"] + df["county"] + df["tract"].str.zfill(6)
+    return df.drop(columns=["state", "county", "tract"])
+
+
+def _in_clauses(level, years):
+    """``in`` clauses covering a year of ``level``: tracts are requested per state.
+
+    The state list is fetched once, from the latest of ``years`` that has one.
+    """
+    if level != "tract":
+        return [None]
+    for year in sorted(years, reverse=True):
+        states = _fetch_year(year, "state:*")
+        if states is not None:
+            return [f"state:{fips}" for fips in states["state"]]
+    return []
+
+
+def _update_partitioned(level, for_clause, finish, id_col):
+    """Fetch ``level`` into ``c_timeseries_{level}/{year}.parquet`` and rebuild its cube.
+
+    --append skips the years that already have a partition.
+    """
+    out_dir = LEVEL_OUTPUTS[level]
+    os.makedirs(out_dir, exist_ok=True)
+    have = {int(f.split(".")[0]) for f in os.listdir(out_dir) if f.endswith(".parquet")}
+    years = [y for y in YEARS if not (APPEND and y in have)]
+    if years:
+        _fetch_partitions(level, for_clause, finish, id_col, years)
+    else:
+        _log(f"{level} timeseries already has {YEARS[0]}-{YEARS[-1]}; nothing to fetch")
+    files = sorted(
+        os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(".parquet")
     )
-    df["pct_owner_occupied"] = df["_tenure_owner"] / df["_tenure_total"]
-    df["pct_renter_occupied"] = df["_tenure_renter"] / df["_tenure_total"]
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
-    return df.drop(columns=[c for c in df.columns if c.startswith("_")])
+    if files:
+        with run_metrics.stage("cube"):
+            TimeseriesCube.write_partitions(f"{out_dir}_cube", files, id_col, "NAME")
+        _log(f"Saved {out_dir}_cube/ ({len(files)} years)")
+
+
+def _fetch_partitions(level, for_clause, finish, id_col, years):
+    """Fetch, process and write ``years`` of ``level``, one partition per year.
+
+    Each year's requests (one per state for tracts) share the worker pool, and a year is
+    processed and written as soon as its last response arrives, so only the years in
+    flight are held in memory. A year with a failed request is not written (a partition
+    missing some states would look complete), so --append fetches it again.
+    """
+    out_dir = LEVEL_OUTPUTS[level]
+    clauses = _in_clauses(level, years)
+    jobs = [(year, c) for year in years for c in clauses]
+    _log(f"Fetching {level} timeseries ({len(years)} years, {len(jobs)} requests)...")
+    remaining = {year: len(clauses) for year in years}
+    parts = {year: [] for year in years}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=rate.maximum) as executor:
+        futures = {executor.submit(_fetch_year, year, for_clause, c): year for year, c in jobs}
+        for future in as_completed(futures):
+            year = futures[future]
+            result = future.result()
+            if result is None:
+                failed.add(year)
+            else:
+                parts[year].append(result)
+            remaining[year] -= 1
+            if remaining[year]:
+                continue
+            year_parts = parts.pop(year)
+            if not year_parts:
+                _log(f"  {level} {year}: not available")
+                continue
+            if year in failed:
+                _log(f"  {level} {year}: incomplete, not saved (rerun with --append)")
+                continue
+            df = finish(_process(pd.concat(year_parts, ignore_index=True)))
+            keys = [c for c in df.columns if c not in VALUE_COLUMNS]
+            df = df.reindex(columns=keys + VALUE_COLUMNS)
+            df = df.sort_values(id_col).reset_index(drop=True)
+            with run_metrics.stage("save"):
+                write_table(df, os.path.join(out_dir, f"{year}.parquet"))
+            _log(f"  {level} {year}: {len(df)} rows -> {out_dir}/{year}.parquet")
 
 
 # State ########################################################################################
-ts_state = _process(_fetch_all_years("state:*", "state"))
-ts_state = ts_state.drop(columns=["state"], errors="ignore").rename(
-    columns={"NAME": "state"}
-)
-ts_state = ts_state.sort_values(["state", "year"]).reset_index(drop=True)
-_log(
-    f"State timeseries complete: {len(ts_state)} rows, {len(ts_state.columns)} columns"
-)
+ts_state = None
+if "state" in levels:
+    ts_state = _update(
+        "c_timeseries_state.parquet", "state:*", "State", _finish_state, ["state", "year"]
+    )
 
 # County #######################################################################################
-ts_county = _process(_fetch_all_years("county:*", "county"))
-ts_county["GEOID"] = ts_county["state"] + ts_county["county"]
-ts_county = ts_county.drop(columns=["state", "county"], errors="ignore")
-ts_county = ts_county.sort_values(["NAME", "year"]).reset_index(drop=True)
+ts_county = None
+if "county" in levels:
+    ts_county = _update(
+        "c_timeseries_county.parquet", "county:*", "County", _finish_county, ["NAME", "year"]
+    )
+
+# ZCTA and tract (written per year as they arrive) #############################################
+if "zcta" in levels:
+    _update_partitioned("zcta", "zip code tabulation area:*", _finish_zcta, "zcta")
+if "tract" in levels:
+    _update_partitioned("tract", "tract:*", _finish_tract, "GEOID")
+
 _log(
-    f"County timeseries complete: {len(ts_county)} rows, {len(ts_county.columns)} columns"
+    f"Download complete ({cache.summary()}, {rate.summary()}, {connection_summary(session)}, "
+    f"{run_metrics.summary()}, evicted {cache.evict()} stale entries)"
 )
 
 # Save #########################################################################################
-ts_state.to_csv("c_timeseries_state.csv", index=False)
-_log("Saved c_timeseries_state.csv")
-ts_county.to_csv("c_timeseries_county.csv", index=False)
-_log("Saved c_timeseries_county.csv")
+with run_metrics.stage("save"):
+    for path, ts, id_col, name_col in [
+        ("c_timeseries_state.parquet", ts_state, "state", "state"),
+        ("c_timeseries_county.parquet", ts_county, "GEOID", "NAME"),
+    ]:
+        if ts is not None:
+            write_table(ts, path)
+            cube_path = path.removesuffix(".parquet") + "_cube"
+            TimeseriesCube.from_frame(ts, id_col, name_col).save(cube_path)
+            _log(f"Saved {path} and {cube_path}/")
+
+_report = run_metrics.write(
+    "timeseries", cache=cache.stats(), rate=rate.stats(), connections=connection_stats(session)
+)
+_log(f"Run metrics written to {_report}")
 _log(f"Done! Total time: {time.time() - _start:.0f}s")
@@ -1,23 +1,37 @@
-"""Download data files from GCS before app startup."""
+"""Download data files from GCS, all before app startup or one at a time on demand.
 
+Files already on disk whose checksum matches the stored object are skipped, the rest are
+downloaded concurrently, and each download lands in a temp file renamed into place, so an
+interrupted start never leaves a half-written file behind. Set DATA_DIR to sync from a
+local directory instead of the GCS_BUCKET bucket (tests, offline runs). With USE_BUNDLE=true
+the only file is BUNDLE_FILE, the single-file snapshot of FILES that build_bundle.py writes.
+"""
+
+import base64
+import hashlib
 import os
-from google.cloud import storage
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-BUCKET = os.environ["GCS_BUCKET"]
 ACS_YEAR = 2024
 DEV_MODE = os.environ.get("DEV_MODE") == "true"
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "8"))
+USE_BUNDLE = os.environ.get("USE_BUNDLE") == "true"
+BUNDLE_FILE = f"app_data_{ACS_YEAR}.bundle"
 
 FILES = [
-    # ACS year-specific CSVs
-    f"c_state_{ACS_YEAR}.csv",
-    f"c_dma_{ACS_YEAR}.csv",
-    f"c_county_state_{ACS_YEAR}.csv",
-    f"c_zcta_dma_{ACS_YEAR}.csv",
-    f"c_congressional_district_{ACS_YEAR}.csv",
-    f"state_name_{ACS_YEAR}.csv",
+    # ACS year-specific tables
+    f"c_state_{ACS_YEAR}.parquet",
+    f"c_dma_{ACS_YEAR}.parquet",
+    f"c_county_state_{ACS_YEAR}.parquet",
+    f"c_zcta_dma_{ACS_YEAR}.parquet",
+    f"c_congressional_district_{ACS_YEAR}.parquet",
+    f"state_name_{ACS_YEAR}.parquet",
     # Timeseries (all years, no suffix)
-    "c_timeseries_state.csv",
-    "c_timeseries_county.csv",
+    "c_timeseries_state.parquet",
+    "c_timeseries_county.parquet",
     # Static mapping
     "zcta_to_dma.csv",
     # Shapefiles
@@ -30,20 +44,160 @@ FILES = [
 
 if DEV_MODE:
     FILES += [
-        f"c_tract_{ACS_YEAR}.csv",
-        f"c_block_group_{ACS_YEAR}.csv",
+        f"c_tract_{ACS_YEAR}.parquet",
+        f"c_block_group_{ACS_YEAR}.parquet",
         "tract_geom.shp", "tract_geom.shx", "tract_geom.dbf", "tract_geom.prj", "tract_geom.cpg",
         "block_group_geom.shp", "block_group_geom.shx", "block_group_geom.dbf",
         "block_group_geom.prj", "block_group_geom.cpg",
     ]
 
-client = storage.Client()
-bucket = client.bucket(BUCKET)
 
-print(f"Downloading {len(FILES)} files from gs://{BUCKET}...")
-for name in FILES:
-    blob = bucket.blob(name)
-    blob.download_to_filename(name)
-    print(f"  {name}")
+def _md5(path):
+    """Base64 MD5 of a file, the form GCS reports as ``md5_hash``."""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return base64.b64encode(h.digest()).decode()
+
+
+def _crc32c(path):
+    """Base64 big-endian CRC32C of a file, the form GCS reports as ``crc32c``."""
+    import google_crc32c
+
+    checksum = google_crc32c.Checksum()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode()
+
+
+_CHECKSUMS = {"md5": _md5, "crc32c": _crc32c}
+
+
+class GCSBackend:
+    """Objects in a GCS bucket. One listing call returns every object's stored checksum."""
+
+    def __init__(self, bucket_name):
+        from google.cloud import storage
+
+        self.name = f"gs://{bucket_name}"
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(bucket_name)
+
+    def checksums(self):
+        """Object name -> (algorithm, base64 checksum); composite objects only have crc32c."""
+        return {
+            blob.name: ("md5", blob.md5_hash) if blob.md5_hash else ("crc32c", blob.crc32c)
+            for blob in self.client.list_blobs(self.bucket)
+        }
+
+    def download(self, name, path):
+        self.bucket.blob(name).download_to_filename(path)
+
+
+class LocalBackend:
+    """A local directory standing in for the bucket."""
+
+    def __init__(self, root):
+        self.name = root
+        self.root = root
+
+    def checksums(self):
+        return {
+            name: ("md5", _md5(os.path.join(self.root, name)))
+            for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name))
+        }
+
+    def download(self, name, path):
+        shutil.copyfile(os.path.join(self.root, name), path)
+
+
+def backend_from_env():
+    """LocalBackend for DATA_DIR if set, otherwise GCSBackend for GCS_BUCKET."""
+    if os.environ.get("DATA_DIR"):
+        return LocalBackend(os.environ["DATA_DIR"])
+    return GCSBackend(os.environ["GCS_BUCKET"])
+
+
+def is_current(name, checksum):
+    """Whether the local copy of ``name`` matches the stored ``(algorithm, checksum)``."""
+    if checksum is None or not os.path.exists(name):
+        return False
+    algorithm, expected = checksum
+    return _CHECKSUMS[algorithm](name) == expected
+
+
+def fetch(backend, name, checksum=None):
+    """Download ``name`` unless the local copy is current; returns True if it downloaded.
+
+    The object is written to a temp file next to ``name`` and renamed into place.
+    """
+    if is_current(name, checksum):
+        return False
+    tmp = f"{name}.{os.getpid()}.part"
+    try:
+        backend.download(name, tmp)
+        os.replace(tmp, name)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return True
+
+
+def sync(backend, names, workers=FETCH_WORKERS):
+    """Fetch ``names``, up to ``workers`` at a time; returns (downloaded, skipped) names."""
+    checksums = backend.checksums()
+    missing = [name for name in names if name not in checksums]
+    if missing:
+        raise FileNotFoundError(f"not in {backend.name}: {missing}")
+    downloaded, skipped = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, backend, n, checksums[n]): n for n in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            if future.result():
+                downloaded.append(name)
+                print(f"  {name}", flush=True)
+            else:
+                skipped.append(name)
+    return downloaded, skipped
+
+
+class LazyFetcher:
+    """``fetch`` for one file at a time, for loading data on demand (app.py).
+
+    The backend is created and listed on the first call; concurrent calls for the same file
+    wait for one download.
+    """
+
+    def __init__(self, make_backend=backend_from_env):
+        self._make_backend = make_backend
+        self._backend = None
+        self._checksums = None
+        self._lock = threading.Lock()
+        self._file_locks = {}
+
+    def __call__(self, name):
+        with self._lock:
+            if self._backend is None:
+                self._backend = self._make_backend()
+                self._checksums = self._backend.checksums()
+            file_lock = self._file_locks.setdefault(name, threading.Lock())
+        if name not in self._checksums:
+            raise FileNotFoundError(f"not in {self._backend.name}: {name}")
+        with file_lock:
+            fetch(self._backend, name, self._checksums[name])
+
 
-print("Done.")
+if __name__ == "__main__":
+    _start = time.time()
+    _backend = backend_from_env()
+    _names = [BUNDLE_FILE] if USE_BUNDLE else FILES
+    print(f"Syncing {len(_names)} files from {_backend.name} ({FETCH_WORKERS} workers)...")
+    _downloaded, _skipped = sync(_backend, _names)
+    print(
+        f"Done: {len(_downloaded)} downloaded, {len(_skipped)} already current "
+        f"({time.time() - _start:.1f}s)."
+    )
@@ -0,0 +1,345 @@
+"""Local stand-in for api.census.gov serving synthetic ACS 5-year responses.
+
+Serves ``variables.json`` and ``acs5`` data for every geography level the pipeline uses,
+with deterministic values (and the odd Census sentinel), optional latency and injected
+503/429 responses. Point the download scripts at it with CENSUS_API_BASE:
+
+    python mock_census_api.py --port 8765 --latency 0.05 --throttle-rate 0.02 &
+    CENSUS_API_BASE=http://127.0.0.1:8765 python download.py --force
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SENTINEL = -666666666
+
+AGES = [
+    "Under 5 years", "5 to 9 years", "10 to 14 years", "15 to 17 years", "18 and 19 years",
+    "20 years", "21 years", "22 to 24 years", "25 to 29 years", "30 to 34 years",
+    "35 to 39 years", "40 to 44 years", "45 to 49 years", "50 to 54 years", "55 to 59 years",
+    "60 and 61 years", "62 to 64 years", "65 and 66 years", "67 to 69 years", "70 to 74 years",
+    "75 to 79 years", "80 to 84 years", "85 years and over",
+]
+RACES = {
+    "A": "White Alone",
+    "B": "Black or African American Alone",
+    "C": "American Indian and Alaska Native Alone",
+    "D": "Asian Alone",
+    "E": "Native Hawaiian and Other Pacific Islander Alone",
+    "F": "Some Other Race Alone",
+    "G": "Two or More Races",
+    "H": "White Alone, Not Hispanic or Latino",
+    "I": "Hispanic or Latino",
+}
+INCOME_BINS = [
+    "Less than $10,000", "$10,000 to $14,999", "$15,000 to $19,999", "$20,000 to $24,999",
+    "$25,000 to $29,999", "$30,000 to $34,999", "$35,000 to $39,999", "$40,000 to $44,999",
+    "$45,000 to $49,999", "$50,000 to $59,999", "$60,000 to $74,999", "$75,000 to $99,999",
+    "$100,000 to $124,999", "$125,000 to $149,999", "$150,000 to $199,999", "$200,000 or more",
+]
+VALUE_BINS = [
+    "Less than $10,000", "$10,000 to $14,999", "$15,000 to $19,999", "$20,000 to $24,999",
+    "$25,000 to $29,999", "$30,000 to $34,999", "$35,000 to $39,999", "$40,000 to $49,999",
+    "$50,000 to $59,999", "$60,000 to $69,999", "$70,000 to $79,999", "$80,000 to $89,999",
+    "$90,000 to $99,999", "$100,000 to $124,999", "$125,000 to $149,999",
+    "$150,000 to $174,999", "$175,000 to $199,999", "$200,000 to $249,999",
+    "$250,000 to $299,999", "$300,000 to $399,999", "$400,000 to $499,999",
+    "$500,000 to $749,999", "$750,000 to $999,999", "$1,000,000 to $1,499,999",
+    "$1,500,000 to $1,999,999", "$2,000,000 or more",
+]
+RENT_BINS = [
+    "Less than $100", "$100 to $149", "$150 to $199", "$200 to $249", "$250 to $299",
+    "$300 to $349", "$350 to $399", "$400 to $449", "$450 to $499", "$500 to $549",
+    "$550 to $599", "$600 to $649", "$650 to $699", "$700 to $749", "$750 to $799",
+    "$800 to $899", "$900 to $999", "$1,000 to $1,249", "$1,250 to $1,499",
+    "$1,500 to $1,999", "$2,000 to $2,499", "$2,500 to $2,999", "$3,000 to $3,499",
+    "$3,500 or more",
+]
+STATE_NAMES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut",
+    "Delaware", "District of Columbia", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois",
+    "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts",
+    "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada",
+    "New Hampshire", "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota",
+    "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina",
+    "South Dakota", "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington",
+    "West Virginia", "Wisconsin", "Wyoming", "Puerto Rico",
+]
+STATE_FIPS = [
+    "01", "02", "04", "05", "06", "08", "09", "10", "11", "12", "13", "15", "16", "17", "18",
+    "19", "20", "21", "22", "23", "24", "25", "26", "27", "28", "29", "30", "31", "32", "33",
+    "34", "35", "36", "37", "38", "39", "40", "41", "42", "44", "45", "46", "47", "48", "49",
+    "50", "51", "53", "54", "55", "56", "72",
+]
+
+
+def _var(concept, label, group):
+    return {"concept": concept, "label": label, "group": group}
+
+
+def build_variables(year):
+    """Return a synthetic variables.json payload covering every table the pipeline requests."""
+    v = {}
+    age_concept = "Sex by Age"
+    v["B01001_001E"] = _var(age_concept, "Estimate!!Total:", "B01001")
+    v["B01001_002E"] = _var(age_concept, "Estimate!!Total:!!Male:", "B01001")
+    for i, age in enumerate(AGES):
+        v[f"B01001_{3 + i:03d}E"] = _var(age_concept, f"Estimate!!Total:!!Male:!!{age}", "B01001")
+    v["B01001_026E"] = _var(age_concept, "Estimate!!Total:!!Female:", "B01001")
+    for i, age in enumerate(AGES):
+        v[f"B01001_{27 + i:03d}E"] = _var(
+            age_concept, f"Estimate!!Total:!!Female:!!{age}", "B01001"
+        )
+    for suffix, race in RACES.items():
+        g = f"B01001{suffix}"
+        concept = f"Sex by Age ({race})"
+        v[f"{g}_001E"] = _var(concept, "Estimate!!Total:", g)
+        v[f"{g}_002E"] = _var(concept, "Estimate!!Total:!!Male:", g)
+        v[f"{g}_017E"] = _var(concept, "Estimate!!Total:!!Female:", g)
+    edu = "Educational Attainment for the Population 25 Years and Over"
+    for i in range(1, 26):
+        v[f"B15003_{i:03d}E"] = _var(edu, f"Estimate!!Total:!!Level {i}", "B15003")
+    v["B15003_001E"]["label"] = "Estimate!!Total:"
+    emp = "Employment Status for the Population 16 Years and Over"
+    for i, lab in enumerate(
+        ["", "In labor force:", "In labor force:!!Civilian labor force:",
+         "In labor force:!!Civilian labor force:!!Employed",
+         "In labor force:!!Civilian labor force:!!Unemployed",
+         "In labor force:!!Armed Forces", "Not in labor force"], 1
+    ):
+        v[f"B23025_{i:03d}E"] = _var(emp, f"Estimate!!Total:!!{lab}".rstrip("!"), "B23025")
+    pov = "Poverty Status in the Past 12 Months by Sex by Age"
+    v["B17001_001E"] = _var(pov, "Estimate!!Total:", "B17001")
+    v["B17001_002E"] = _var(
+        pov, "Estimate!!Total:!!Income in the past 12 months below poverty level:", "B17001"
+    )
+    v["B17001_031E"] = _var(
+        pov, "Estimate!!Total:!!Income in the past 12 months at or above poverty level:",
+        "B17001",
+    )
+    ten = "Tenure"
+    v["B25003_001E"] = _var(ten, "Estimate!!Total:", "B25003")
+    v["B25003_002E"] = _var(ten, "Estimate!!Total:!!Owner occupied", "B25003")
+    v["B25003_003E"] = _var(ten, "Estimate!!Total:!!Renter occupied", "B25003")
+    hh = "Households by Type"
+    v["B11012_001E"] = _var(hh, "Estimate!!Total:", "B11012")
+    inc = f"Household Income in the Past 12 Months (in {year} Inflation-Adjusted Dollars)"
+    v["B19001_001E"] = _var(inc, "Estimate!!Total:", "B19001")
+    for i, b in enumerate(INCOME_BINS, 2):
+        v[f"B19001_{i:03d}E"] = _var(inc, f"Estimate!!Total:!!{b}", "B19001")
+    v["B25075_001E"] = _var("Value", "Estimate!!Total:", "B25075")
+    for i, b in enumerate(VALUE_BINS, 2):
+        v[f"B25075_{i:03d}E"] = _var("Value", f"Estimate!!Total:!!{b}", "B25075")
+    v["B25063_001E"] = _var("Gross Rent", "Estimate!!Total:", "B25063")
+    v["B25063_002E"] = _var("Gross Rent", "Estimate!!Total:!!With cash rent:", "B25063")
+    for i, b in enumerate(RENT_BINS, 3):
+        v[f"B25063_{i:03d}E"] = _var(
+            "Gross Rent", f"Estimate!!Total:!!With cash rent:!!{b}", "B25063"
+        )
+    v["B25063_027E"] = _var("Gross Rent", "Estimate!!Total:!!No cash rent", "B25063")
+    v["B19049_003E"] = _var(
+        f"Median Household Income in the Past 12 Months (in {year} Inflation-Adjusted Dollars)"
+        " by Age of Householder",
+        "Estimate!!Median household income in the past 12 months!!Householder 25 to 44 years",
+        "B19049",
+    )
+    v["B19013_001E"] = _var(
+        f"Median Household Income in the Past 12 Months (in {year} Inflation-Adjusted Dollars)",
+        "Estimate!!Median household income in the past 12 months",
+        "B19013",
+    )
+    v["B25077_001E"] = _var("Median Value (Dollars)", "Estimate!!Median value (dollars)", "B25077")
+    v["B25064_001E"] = _var(
+        "Median Gross Rent (Dollars)", "Estimate!!Median gross rent", "B25064"
+    )
+    return {"variables": v}
+
+
+class Geography:
+    """Deterministic synthetic geography hierarchy."""
+
+    def __init__(self, counties=4, tracts=3, block_groups=2, zctas=400, districts=2):
+        self.states = list(zip(STATE_FIPS, STATE_NAMES))
+        self.counties = [
+            (s, f"{c * 2 + 1:03d}") for s, _ in self.states for c in range(counties)
+        ]
+        self.tracts = [
+            (s, c, f"{(t + 1) * 100:06d}") for s, c in self.counties for t in range(tracts)
+        ]
+        self.block_groups = [
+            (s, c, t, str(b + 1)) for s, c, t in self.tracts for b in range(block_groups)
+        ]
+        self.zctas = [f"{10000 + i * 7:05d}" for i in range(zctas)]
+        self.districts = [(s, f"{d + 1:02d}") for s, _ in self.states for d in range(districts)]
+        self.state_name = dict(self.states)
+
+    def rows(self, level, where):
+        """Return (key_header, [(NAME, key values...)]) for one for/in clause."""
+        state = where.get("state")
+        county = where.get("county")
+        if level == "state":
+            return ["state"], [(n, s) for s, n in self.states]
+        if level == "county":
+            return ["state", "county"], [
+                (f"County {c}, {self.state_name[s]}", s, c)
+                for s, c in self.counties
+                if state in (None, s)
+            ]
+        if level == "zip code tabulation area":
+            return ["zip code tabulation area"], [(f"ZCTA5 {z}", z) for z in self.zctas]
+        if level == "tract":
+            return ["state", "county", "tract"], [
+                (f"Census Tract {t}; County {c}; {self.state_name[s]}", s, c, t)
+                for s, c, t in self.tracts
+                if state in (None, s) and county in (None, c)
+            ]
+        if level == "block group":
+            return ["state", "county", "tract", "block group"], [
+                (f"Block Group {b}; Census Tract {t}; County {c}", s, c, t, b)
+                for s, c, t, b in self.block_groups
+                if state in (None, s) and county in (None, c)
+            ]
+        if level == "congressional district":
+            return ["state", "congressional district"], [
+                (f"Congressional District {d}, {self.state_name[s]}", s, d)
+                for s, d in self.districts
+                if state in (None, s)
+            ]
+        return None, None
+
+
+def _value(var, key):
+    seed = zlib.crc32(f"{var}|{key}".encode())
+    if seed % 997 == 0:
+        return SENTINEL
+    if "B19013" in var or "B19049" in var:
+        return 30000 + seed % 90000
+    if "B25077" in var:
+        return 90000 + seed % 700000
+    if "B25064" in var:
+        return 600 + seed % 2200
+    return seed % 5000
+
+
+def _parse_clause(clause):
+    """Parse 'state:06 county:037' into {'state': '06', 'county': '037'}."""
+    out = {}
+    for part in (clause or "").split():
+        k, _, v = part.partition(":")
+        if v != "*":
+            out[k.replace("+", " ")] = v
+    return out
+
+
+def make_handler(geo, variables, latency, error_rate, throttle_rate, seed, counts):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            payload = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if latency:
+                time.sleep(latency)
+            with lock:
+                roll = rng.random()
+                counts["requests"] += 1
+            if roll < throttle_rate:
+                return self._send(429, "rate limited", {"Retry-After": "1"})
+            if roll < throttle_rate + error_rate:
+                return self._send(503, "unavailable")
+            if url.path.endswith("/variables.json"):
+                return self._send(200, json.dumps(variables))
+            qs = parse_qs(url.query)
+            get = qs.get("get", [""])[0].split(",")
+            level, _, _ = qs.get("for", [""])[0].partition(":")
+            keys, units = geo.rows(level, _parse_clause(qs.get("in", [""])[0]))
+            if keys is None:
+                return self._send(400, f"unknown geography {level}")
+            var_cols = [g for g in get if g != "NAME"]
+            out = [["NAME", *var_cols, *keys]]
+            for name, *key_vals in units:
+                k = "|".join(key_vals)
+                out.append([name, *(str(_value(v, k)) for v in var_cols), *key_vals])
+            return self._send(200, json.dumps(out))
+
+    return Handler
+
+
+def serve(port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0, seed=0, **geography):
+    """Start the mock server on a daemon thread; returns ``(server, base_url, counts)``.
+
+    ``port=0`` picks a free port. ``geography`` is passed to ``Geography`` to scale the
+    number of counties, tracts, block groups, ZCTAs and districts.
+    """
+    counts = {"requests": 0}
+    handler = make_handler(
+        Geography(**geography), build_variables(2024), latency, error_rate, throttle_rate,
+        seed, counts,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", counts
+
+
+def add_server_args(parser):
+    """Latency, error-rate and geography-size options shared with benchmark_pipeline.py."""
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--counties", type=int, default=4, help="counties per state")
+    parser.add_argument("--tracts", type=int, default=3, help="tracts per county")
+    parser.add_argument("--block-groups", type=int, default=2, help="block groups per tract")
+    parser.add_argument("--zctas", type=int, default=400)
+    parser.add_argument("--districts", type=int, default=2, help="districts per state")
+
+
+def server_kwargs(args):
+    return {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "counties": args.counties,
+        "tracts": args.tracts,
+        "block_groups": args.block_groups,
+        "zctas": args.zctas,
+        "districts": args.districts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_args(parser)
+    args = parser.parse_args()
+    server, url, _ = serve(args.port, **server_kwargs(args))
+    print(f"Mock Census API on {url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Run the data pipeline as a dependency graph, skipping steps whose inputs haven't changed.
+
+Each step is one of the pipeline scripts with its declared input and output files. A step
+depends on the steps that produce its inputs, and it reruns only when its script, inputs or
+arguments hash differently from its last successful run, or when its outputs are missing or
+were changed since. Steps whose dependencies are done run concurrently, e.g. the shapefile
+download alongside the ACS downloads.
+
+    python run_pipeline.py [acs timeseries ...] [--jobs 3] [--force] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ACS_YEAR = 2024
+STATE_FILE = ".pipeline_state.json"
+
+_SHAPEFILE_PARTS = ["shp", "shx", "dbf", "prj", "cpg"]
+
+
+def _shapefiles(*names):
+    return [f"{name}.{ext}" for name in names for ext in _SHAPEFILE_PARTS]
+
+
+class Step:
+    """One pipeline script with the files it reads and writes (directories hash recursively)."""
+
+    def __init__(self, name, script, inputs=(), outputs=(), args=()):
+        self.name = name
+        self.script = script
+        self.inputs = [script, *inputs]
+        self.outputs = list(outputs)
+        self.args = list(args)
+
+
+# Scripts that skip work when their outputs exist get --force: the runner already decided
+STEPS = [
+    Step(
+        "zcta_to_dma",
+        "build_zcta_to_dma.py",
+        inputs=["ZIPCodetoZCTACrosswalk2021UDS.xlsx", "zip_to_dma.csv"],
+        outputs=["zcta_to_dma.csv"],
+    ),
+    Step(
+        "shape_files",
+        "download_shape_files.py",
+        outputs=_shapefiles(
+            "state_geom",
+            "county_geom",
+            "zcta_geom",
+            "tract_geom",
+            "block_group_geom",
+            "congressional_district_geom",
+        ),
+    ),
+    Step(
+        "acs",
+        "download.py",
+        inputs=[
+            "zcta_to_dma.csv",
+            "census_api.py",
+            "census_frames.py",
+            "census_metrics.py",
+            "census_rollup.py",
+        ],
+        outputs=[
+            f"c_state_{ACS_YEAR}.parquet",
+            f"c_dma_{ACS_YEAR}.parquet",
+            f"c_county_state_{ACS_YEAR}.parquet",
+            f"c_zcta_dma_{ACS_YEAR}.parquet",
+            f"c_tract_{ACS_YEAR}.parquet",
+            f"c_block_group_{ACS_YEAR}.parquet",
+            f"c_congressional_district_{ACS_YEAR}.parquet",
+            f"state_name_{ACS_YEAR}.parquet",
+        ],
+        args=["--force"],
+    ),
+    Step(
+        "timeseries",
+        "download_timeseries.py",
+        inputs=["census_api.py", "census_cube.py", "census_frames.py", "census_metrics.py"],
+        outputs=[
+            f"c_timeseries_{level}{suffix}"
+            for level in ["state", "county"]
+            for suffix in [".parquet", "_cube"]
+        ] + [
+            f"c_timeseries_{level}{suffix}"
+            for level in ["zcta", "tract"]
+            for suffix in ["", "_cube"]
+        ],
+        args=["--force"],
+    ),
+    Step(
+        "bundle",
+        "build_bundle.py",
+        inputs=[
+            "census_bundle.py",
+            "census_cube.py",
+            "fetch_data.py",
+            "zcta_to_dma.csv",
+            "dma_polygons.geojson",
+            "dma_polygon_map.csv",
+            f"c_state_{ACS_YEAR}.parquet",
+            f"c_dma_{ACS_YEAR}.parquet",
+            f"c_county_state_{ACS_YEAR}.parquet",
+            f"c_zcta_dma_{ACS_YEAR}.parquet",
+            f"c_congressional_district_{ACS_YEAR}.parquet",
+            f"state_name_{ACS_YEAR}.parquet",
+            "c_timeseries_state_cube",
+            "c_timeseries_county_cube",
+            *_shapefiles("state_geom", "county_geom", "zcta_geom", "congressional_district_geom"),
+        ],
+        outputs=[f"app_data_{ACS_YEAR}.bundle"],
+    ),
+]
+
+
+def _log(msg):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+class Hasher:
+    """SHA-256 of files and directories, reusing a digest while a file's size and mtime hold.
+
+    The (size, mtime_ns, digest) records persist with the run state, so an unchanged
+    multi-hundred-MB shapefile is not reread on every run.
+    """
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        st = os.stat(path)
+        with self._lock:
+            record = self.known.get(path)
+        if record and record[0] == st.st_size and record[1] == st.st_mtime_ns:
+            return record[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.known[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def snapshot(self):
+        """Records for the files that still exist, for the saved state."""
+        with self._lock:
+            return {p: r for p, r in self.known.items() if os.path.exists(p)}
+
+    def digest(self, path):
+        """Digest of a file, or of a directory tree (names and contents); None if missing."""
+        if os.path.isfile(path):
+            return self._file(path)
+        if not os.path.isdir(path):
+            return None
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).encode())
+                h.update(self._file(full).encode())
+        return h.hexdigest()
+
+    def fingerprint(self, paths, extra=()):
+        """One digest over ``paths`` (missing ones included as such) and ``extra`` strings."""
+        h = hashlib.sha256()
+        for path in paths:
+            h.update(f"{path}={self.digest(path)}\n".encode())
+        for item in extra:
+            h.update(f"{item}\n".encode())
+        return h.hexdigest()
+
+
+def _load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"steps": {}, "files": {}}
+    with open(STATE_FILE) as f:
+        return json.load(f)
+
+
+def _save_state(state):
+    tmp = f"{STATE_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_FILE)
+
+
+def dependencies(steps):
+    """Step name -> names of the steps that produce its inputs."""
+    producer = {out: step.name for step in steps for out in step.outputs}
+    return {
+        step.name: {producer[p] for p in step.inputs if p in producer and producer[p] != step.name}
+        for step in steps
+    }
+
+
+def _with_upstream(targets, deps):
+    selected, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(deps[name])
+    return selected
+
+
+def _is_current(step, record, hasher):
+    """Whether ``step``'s last successful run used the current inputs and left these outputs."""
+    if record is None or not all(os.path.exists(p) for p in step.outputs):
+        return False
+    return (
+        record["inputs"] == hasher.fingerprint(step.inputs, step.args)
+        and record["outputs"] == hasher.fingerprint(step.outputs)
+    )
+
+
+def _run_step(step, verbose):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, step.script, *step.args],
+        stdout=None if verbose else subprocess.DEVNULL,
+    )
+    return proc.returncode, time.perf_counter() - start
+
+
+def run(steps, targets=None, jobs=3, force=False, dry_run=False, verbose=False):
+    """Run ``targets`` (default: every step) and their upstream steps; returns failed names.
+
+    A step is checked only once its dependencies have finished, so it sees their fresh
+    outputs. ``force`` reruns the targets themselves even when they are current.
+    """
+    by_name = {step.name: step for step in steps}
+    deps = dependencies(steps)
+    targets = list(targets or by_name)
+    selected = _with_upstream(targets, deps)
+    state = _load_state()
+    hasher = Hasher(state.get("files"))
+    state_lock = threading.Lock()
+
+    pending = {name: set(deps[name]) & selected for name in selected}
+    done, failed, skipped, changed = set(), set(), set(), set()
+    running = {}
+
+    def _execute(step):
+        """Run ``step`` if it is stale; returns (status, seconds)."""
+        # In a dry run, upstream steps that would run haven't changed this step's inputs yet
+        stale_upstream = dry_run and deps[step.name] & changed
+        if not (force and step.name in targets) and not stale_upstream and _is_current(
+            step, state["steps"].get(step.name), hasher
+        ):
+            return "current", 0.0
+        if dry_run:
+            return "would run", 0.0
+        inputs = hasher.fingerprint(step.inputs, step.args)
+        _log(f"{step.name}: running {step.script} {' '.join(step.args)}".rstrip())
+        code, seconds = _run_step(step, verbose)
+        if code != 0:
+            return f"failed (exit {code})", seconds
+        missing = [p for p in step.outputs if not os.path.exists(p)]
+        if missing:
+            return f"failed (did not write {', '.join(missing)})", seconds
+        with state_lock:
+            state["steps"][step.name] = {
+                "inputs": inputs,
+                "outputs": hasher.fingerprint(step.outputs),
+                "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            state["files"] = hasher.snapshot()
+            _save_state(state)
+        return "ran", seconds
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name in [n for n, waiting in pending.items() if not waiting - done]:
+                del pending[name]
+                running[executor.submit(_execute, by_name[name])] = name
+            # Steps downstream of a failure can never start
+            blocked = [n for n, waiting in pending.items() if waiting & (failed | skipped)]
+            while blocked:
+                for name in blocked:
+                    del pending[name]
+                    skipped.add(name)
+                    _log(f"{name}: skipped (upstream failed)")
+                blocked = [n for n, waiting in pending.items() if waiting & skipped]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                status, seconds = future.result()
+                _log(f"{name}: {status}" + (f" in {seconds:.0f}s" if seconds else ""))
+                (failed if status.startswith("failed") else done).add(name)
+                if status in ("ran", "would run"):
+                    changed.add(name)
+
+    if not dry_run:
+        with state_lock:
+            state["files"] = hasher.snapshot()
+            _save_state(state)
+    return failed | skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help=f"steps to bring up to date with their upstream (default: {[s.name for s in STEPS]})",
+    )
+    parser.add_argument("--jobs", type=int, default=3, help="steps to run at once")
+    parser.add_argument("--force", action="store_true", help="rerun the targets even if current")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own logs")
+    args = parser.parse_args()
+
+    unknown = set(args.targets) - {step.name for step in STEPS}
+    if unknown:
+        parser.error(f"unknown steps {sorted(unknown)}")
+    failed = run(
+        STEPS,
+        targets=args.targets,
+        jobs=args.jobs,
+        force=args.force,
+        dry_run=args.dry_run,
+        verbose=args.verbose,
+    )
+    if failed:
+        _log(f"Failed: {sorted(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()